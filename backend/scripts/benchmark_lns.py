@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-shot CP-SAT solve vs. Large Neighborhood Search
+
+Compares the best objective over time of solve_with_priorities() and
+solve_with_lns() on the same instance. Uses the given input JSON files, or a
+synthetic roster when none are given.
+
+Usage:
+    python benchmark_lns.py [--employees 30] [--time-limit 60] [input.json ...]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+from typing import List, Tuple
+
+from ortools.sat.python import cp_model
+
+from optimize_schedule import ShiftSchedulingModel
+
+CHECKPOINTS = [1, 2, 5, 10, 20, 30, 45, 60, 90, 120]
+
+
+class ObjectiveTimeline(cp_model.CpSolverSolutionCallback):
+    """Records (seconds, objective) for every solution the solver finds"""
+
+    def __init__(self):
+        super().__init__()
+        self.start = time.time()
+        self.points: List[Tuple[float, float]] = []
+
+    def on_solution_callback(self):
+        self.points.append((time.time() - self.start, self.ObjectiveValue()))
+
+
+def synthetic_instance(num_employees: int, seed: int = 0) -> dict:
+    """Large roster with ~70% availability"""
+    rng = random.Random(seed)
+    employees = [
+        {'id': f'emp{i}', 'name': f'Employee {i}', 'email': f'emp{i}@example.com',
+         'role': 'employee', 'isActive': True}
+        for i in range(num_employees)
+    ]
+    availabilities = [
+        {
+            'employeeId': emp['id'],
+            'weekStart': '2025-11-02',
+            'shifts': {
+                str(day): {
+                    shift: {'status': 'available' if rng.random() < 0.7 else 'unavailable'}
+                    for shift in ['morning', 'evening', 'night']
+                }
+                for day in range(6)
+            }
+        }
+        for emp in employees
+    ]
+    return {'employees': employees, 'availabilities': availabilities, 'vacations': [],
+            'holidays': [], 'weekStart': '2025-11-02'}
+
+
+def build(data: dict) -> ShiftSchedulingModel:
+    model = ShiftSchedulingModel(data)
+    model.add_hard_constraints()
+    model.create_auxiliary_variables()
+    model.build_objective()
+    return model
+
+
+def best_at(points: List[Tuple[float, float]], seconds: float):
+    values = [objective for t, objective in points if t <= seconds]
+    return min(values) if values else None
+
+
+def run(name: str, data: dict, time_limit: float, seed: int = 0):
+    # The solver logs heavily to stderr - keep the benchmark output readable
+    with contextlib.redirect_stderr(io.StringIO()):
+        # Same seed for both builds: the random objective weights must match or
+        # the two objective columns are not comparable
+        random.seed(seed)
+        single_model = build(data)
+        timeline = ObjectiveTimeline()  # Start the clock after building, as LNS does
+        _, single = single_model.solve_with_priorities(time_limit, solution_callback=timeline)
+        random.seed(seed)
+        _, lns = build(data).solve_with_lns(time_limit)
+
+    lns_points = [(step['time_seconds'], step['objective']) for step in lns.get('stats', {}).get('lns_improvements', [])]
+
+    print(f"\n{name}: {len(data['employees'])} employees, {time_limit:.0f}s limit")
+    print(f"{'time (s)':>10} {'single-shot':>14} {'LNS':>14}")
+    for seconds in [c for c in CHECKPOINTS if c <= time_limit] + [time_limit]:
+        single_best, lns_best = best_at(timeline.points, seconds), best_at(lns_points, seconds)
+        print(f"{seconds:>10.0f} {single_best if single_best is not None else '-':>14} {lns_best if lns_best is not None else '-':>14}")
+    print(f"single-shot: {len(timeline.points)} solutions, final {single.get('stats', {}).get('objective_value')}")
+    print(f"LNS: {lns.get('stats', {}).get('lns_iterations')} iterations, final {lns.get('stats', {}).get('objective_value')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='Input JSON files (default: synthetic roster)')
+    parser.add_argument('--employees', type=int, default=30, help='Synthetic roster size')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='Seconds per strategy')
+    args = parser.parse_args()
+
+    if args.inputs:
+        for path in args.inputs:
+            with open(path) as f:
+                run(path, json.load(f), args.time_limit)
+    else:
+        run('synthetic', synthetic_instance(args.employees), args.time_limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,26 +7,64 @@ It uses constraint programming to ensure all hard constraints are met and optimi
 for soft constraints in priority order.
 """
 
+import heapq
 import json
+import multiprocessing
+import os
+import queue
 import sys
 import random
 import time
 from typing import Dict, List, Set, Tuple, Optional
+import numpy as np
 from ortools.sat.python import cp_model
 
 
-class ShiftSchedulingModel:
-    """Builds and solves the shift scheduling problem using CP-SAT"""
+# Objective weights shared by the CP-SAT model and the evaluator.
+# See solve_with_priorities() for the reasoning behind each priority.
+OBJECTIVE_WEIGHTS = {
+    'unfilled': 1000000,
+    'excess_88': 100000,
+    'eight_eight': 15000,
+    'fairness': 100000,
+    'shift_type_fairness': 20000,
+    'variety': 10000,
+    'morning': 200000,
+}
+MIN3_WEIGHT_RANGE = (85, 115)        # Randomized per solve
+TIE_BREAKER_RANGE = (1000, 3000)     # Random weight per (employee, day, shift)
+
+# Race mode: strategies run in separate processes, in tie-break order
+RACE_STRATEGIES = ['weighted', 'light', 'constructive']
+RACE_GRACE_SECONDS = 5.0  # Model building and reporting on top of the solve time limit
+
+# Named CP-SAT parameter profiles written by tune_parameters.py
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solver_profiles')
+
+
+def load_parameter_profile(name: str) -> dict:
+    """Load the CP-SAT parameter overrides of a named profile from PROFILE_DIR"""
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(name)}.json")
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown parameter profile: {name}")
+    with open(path) as f:
+        profile = json.load(f)
+    print(f"⚙️  Loaded parameter profile '{name}': {profile['parameters']}", file=sys.stderr)
+    return profile['parameters']
+
+
+class ScheduleInstance:
+    """Parsed scheduling input: employees, availability, holidays and frozen shifts"""
 
     def __init__(self, data: dict):
         self.data = data
-        self.model = cp_model.CpModel()
 
         # Parse input
         self.employees = {emp['id']: emp for emp in data['employees']}
         self.employee_ids = list(self.employees.keys())
         self.num_days = 6
         self.shifts = ['morning', 'evening', 'night']
+        self.shift_index = {shift: i for i, shift in enumerate(self.shifts)}
 
         # Build availability map
         self.availability_map = {}
@@ -76,6 +114,13 @@ class ShiftSchedulingModel:
                     else:
                         print(f"   Day {day_str} {shift_id}: FROZEN EMPTY", file=sys.stderr)
 
+        # Rolling-horizon history: compact per-employee summary of previous weeks
+        # historySummaries: [{ employeeId, weeks, shiftCounts: { morning, evening, night },
+        #                      lastShifts: [{ date, shift }] }]
+        # Size does not depend on how many weeks are summarized
+        self.history_counts, self.previous_shifts = self._parse_history(data.get('historySummaries', []))
+        self.history_bound = max((sum(c.values()) for c in self.history_counts.values()), default=0)
+
         # Build valid shifts list (considering holidays and Friday restrictions)
         self.valid_shifts = []
 
@@ -115,6 +160,11 @@ class ShiftSchedulingModel:
 
         print(f"✅ Created {len(self.valid_shifts)} valid shifts", file=sys.stderr)
 
+        # Boolean [day, shift] mask of valid shifts (for vectorized scoring)
+        self.valid_mask = np.zeros((self.num_days, len(self.shifts)), dtype=bool)
+        for day, shift in self.valid_shifts:
+            self.valid_mask[day, self.shift_index[shift]] = True
+
         # Debug: Show availability statistics
         print(f"\n👥 Employee Availability Summary:", file=sys.stderr)
         for emp_id in self.employee_ids:
@@ -125,19 +175,6 @@ class ShiftSchedulingModel:
             )
             print(f"   {emp_name}: {available_count}/{len(self.valid_shifts)} shifts available", file=sys.stderr)
 
-        # Variables: x[emp][day][shift] = 1 if employee emp works shift on day
-        self.x = {}
-        for emp_id in self.employee_ids:
-            for day, shift in self.valid_shifts:
-                self.x[(emp_id, day, shift)] = self.model.NewBoolVar(f'x_{emp_id}_d{day}_{shift}')
-
-        # Auxiliary variables for optimization
-        self.shift_unfilled = {}  # 1 if shift is not filled
-        self.employee_shift_counts = {}  # Total shifts per employee
-        self.employee_morning_counts = {}  # Morning shifts per employee
-        self.eight_eight_violations = {}  # 8-8 patterns per employee
-        self.eight_eight_eight_violations = {}  # 8-8-8 patterns per employee
-
     def _get_date_for_day(self, day: int) -> str:
         """Calculate date string for a given day offset"""
         # This is a simplified version - matches TypeScript getDateForDay logic
@@ -147,6 +184,53 @@ class ShiftSchedulingModel:
         target_date = start_date + timedelta(days=day)
         return target_date.strftime('%Y-%m-%d')
 
+    def _parse_history(self, summaries: List[dict]) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[int, str]]]:
+        """
+        Parse historySummaries into per-employee shift type totals and the shifts
+        worked on the 2 days before weekStart (all that rest rules can reach)
+        """
+        from datetime import datetime
+        week_start = datetime.strptime(self.data['weekStart'], '%Y-%m-%d')
+        summaries = [s for s in summaries if s.get('employeeId') in self.employees]
+        for summary in summaries:
+            if 'weeks' not in summary:
+                raise ValueError(f"Missing required field in historySummaries: weeks (employee {summary['employeeId']})")
+
+        # Scale everyone to the longest horizon so totals are comparable
+        horizon = max((s['weeks'] for s in summaries), default=0)
+        counts = {}
+        previous = {}
+        for summary in summaries:
+            emp_id = summary['employeeId']
+            weeks = summary['weeks']
+            if weeks > 0:
+                counts[emp_id] = {
+                    shift: round(summary.get('shiftCounts', {}).get(shift, 0) * horizon / weeks)
+                    for shift in self.shifts
+                }
+            for last in summary.get('lastShifts', []):
+                offset = (datetime.strptime(last['date'], '%Y-%m-%d') - week_start).days
+                if -2 <= offset <= -1 and last.get('shift') in self.shifts:
+                    previous.setdefault(emp_id, {})[offset] = last['shift']
+
+        if counts:
+            # Employees without history count as average so they are not flooded with shifts
+            average = {
+                shift: round(sum(c[shift] for c in counts.values()) / len(counts))
+                for shift in self.shifts
+            }
+            print(f"📜 History loaded for {len(counts)} employees over {horizon} weeks (average {average})", file=sys.stderr)
+        else:
+            average = {shift: 0 for shift in self.shifts}
+        for emp_id in self.employee_ids:
+            counts.setdefault(emp_id, dict(average))
+
+        return counts, previous
+
+    def _previous_shift(self, emp_id: str, offset: int) -> Optional[str]:
+        """Shift worked on day offset (-1 or -2) before weekStart, from historySummaries"""
+        return self.previous_shifts.get(emp_id, {}).get(offset)
+
     def _is_employee_available(self, emp_id: str, day: int, shift: str) -> bool:
         """Check if employee is available for a shift"""
         # Check vacation
@@ -179,6 +263,90 @@ class ShiftSchedulingModel:
                 return (True, emp_id)  # emp_id can be None for "frozen empty"
         return (False, None)
 
+    def availability_array(self) -> np.ndarray:
+        """Boolean [employee, day, shift] array of availability on valid shifts"""
+        if not hasattr(self, '_availability'):
+            available = np.zeros((len(self.employee_ids), self.num_days, len(self.shifts)), dtype=bool)
+            for e, emp_id in enumerate(self.employee_ids):
+                for day, shift in self.valid_shifts:
+                    available[e, day, self.shift_index[shift]] = self._is_employee_available(emp_id, day, shift)
+            self._availability = available
+        return self._availability
+
+    def interaction_components(self) -> List[Tuple[List[str], List[Tuple[int, str]]]]:
+        """
+        Split the week into independent sub-problems: (employee ids, valid shifts)
+
+        Builds the employee-shift interaction graph: an edge joins an employee and
+        a shift they could take (availability; frozen shifts narrowed to their
+        employee; frozen-empty shifts have none). Rest rules and all per-employee
+        terms (8-8, morning, min-3, variety) only relate shifts of the same
+        employee, so they add no edges between components - which is also why day
+        blocks split by no-work holidays stay joined through their employees. Only
+        the global fairness max/min terms span components.
+        """
+        available = self.availability_array()
+        num_employees = len(self.employee_ids)
+        parent = list(range(num_employees + len(self.valid_shifts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for c, (day, shift) in enumerate(self.valid_shifts):
+            s = self.shift_index[shift]
+            is_frozen, frozen_emp_id = self._is_shift_frozen(day, shift)
+            if is_frozen and (frozen_emp_id is None or '119' in str(frozen_emp_id)):
+                continue
+            employees = np.nonzero(available[:, day, s])[0]
+            if is_frozen and frozen_emp_id in self.employees:
+                frozen_index = self.employee_ids.index(frozen_emp_id)
+                if available[frozen_index, day, s]:
+                    employees = [frozen_index]
+            for e in employees:
+                parent[find(e)] = find(num_employees + c)
+
+        components = {}
+        for e, emp_id in enumerate(self.employee_ids):
+            components.setdefault(find(e), ([], []))[0].append(emp_id)
+        for c, cell in enumerate(self.valid_shifts):
+            components.setdefault(find(num_employees + c), ([], []))[1].append(cell)
+        return list(components.values())
+
+
+class ShiftSchedulingModel(ScheduleInstance):
+    """Builds and solves the shift scheduling problem using CP-SAT"""
+
+    def __init__(self, data: dict, light: bool = False):
+        super().__init__(data)
+        self.model = cp_model.CpModel()
+
+        # Light model: no per-employee variety or shift-type fairness terms (used by race mode)
+        self.light = light
+
+        # Decomposition sub-models: fixed global (low, high) count bounds per fairness
+        # term ('total', 'morning', 'evening', 'night') instead of the local max - min
+        self.fairness_bounds = None
+
+        # CP-SAT parameter overrides (parameterProfile input, or set by tune_parameters.py)
+        profile = data.get('parameterProfile')
+        self.solver_parameters = load_parameter_profile(profile) if profile else {}
+
+        # Variables: x[emp][day][shift] = 1 if employee emp works shift on day
+        self.x = {}
+        for emp_id in self.employee_ids:
+            for day, shift in self.valid_shifts:
+                self.x[(emp_id, day, shift)] = self.model.NewBoolVar(f'x_{emp_id}_d{day}_{shift}')
+
+        # Auxiliary variables for optimization
+        self.shift_unfilled = {}  # 1 if shift is not filled
+        self.employee_shift_counts = {}  # Total shifts per employee
+        self.employee_morning_counts = {}  # Morning shifts per employee
+        self.eight_eight_violations = {}  # 8-8 patterns per employee
+        self.eight_eight_eight_violations = {}  # 8-8-8 patterns per employee
+
     def add_hard_constraints(self):
         """Add all hard constraints that must be satisfied"""
 
@@ -278,6 +446,11 @@ class ShiftSchedulingModel:
                     # night_today + morning_tomorrow <= 1
                     self.model.Add(night_var + morning_next_var <= 1)
 
+            # Night on the day before the week (from historySummaries)
+            morning_first_var = self.x.get((emp_id, 0, 'morning'))
+            if self._previous_shift(emp_id, -1) == 'night' and morning_first_var is not None:
+                self.model.Add(morning_first_var == 0)
+
         print(f"✓ Added hard constraints", file=sys.stderr)
 
     def create_auxiliary_variables(self):
@@ -344,6 +517,14 @@ class ShiftSchedulingModel:
         for emp_id in self.employee_ids:
             violations_88 = []
 
+            # Patterns starting on the day before the week (from historySummaries)
+            previous = self._previous_shift(emp_id, -1)
+            if previous in ['evening', 'night']:
+                # evening→morning or night→evening across the week boundary
+                first_var = self.x.get((emp_id, 0, 'morning' if previous == 'evening' else 'evening'))
+                if first_var is not None:
+                    violations_88.append(first_var)
+
             for day in range(self.num_days - 1):
                 # Evening today → morning tomorrow (8 hours rest - not ideal but allowed)
                 evening_today = self.x.get((emp_id, day, 'evening'))
@@ -382,6 +563,19 @@ class ShiftSchedulingModel:
         for emp_id in self.employee_ids:
             violations_888 = []
 
+            # Patterns starting before the week (from historySummaries)
+            morning_d0 = self.x.get((emp_id, 0, 'morning'))
+            if self._previous_shift(emp_id, -2) == 'night' and self._previous_shift(emp_id, -1) == 'evening' \
+                    and morning_d0 is not None:
+                violations_888.append(morning_d0)
+            evening_d0 = self.x.get((emp_id, 0, 'evening'))
+            morning_d1 = self.x.get((emp_id, 1, 'morning'))
+            if self._previous_shift(emp_id, -1) == 'night' and evening_d0 is not None and morning_d1 is not None:
+                violation = self.model.NewBoolVar(f'violation_888_nem_{emp_id}_prev')
+                self.model.AddBoolAnd([evening_d0, morning_d1]).OnlyEnforceIf(violation)
+                self.model.AddBoolOr([evening_d0.Not(), morning_d1.Not()]).OnlyEnforceIf(violation.Not())
+                violations_888.append(violation)
+
             for day in range(self.num_days - 2):
                 # Pattern 1: night(day0) → evening(day1) → morning(day2)
                 # This is the classic 8-8-8 across 3 days
@@ -425,61 +619,35 @@ class ShiftSchedulingModel:
         # This measures the gap between the most and least frequent shift type for EACH employee
         # Goal: prevent scenarios where one employee gets only mornings, another only evenings, etc.
         self.employee_variety_gaps = {}
-        for emp_id in self.employee_ids:
-            morning_count = self.employee_morning_counts[emp_id]
-            evening_count = self.employee_evening_counts[emp_id]
-            night_count = self.employee_night_counts[emp_id]
+        for emp_id in ([] if self.light else self.employee_ids):
+            # Includes previous weeks when historySummaries are given
+            history = self.history_counts[emp_id]
+            morning_count = self.employee_morning_counts[emp_id] + history['morning']
+            evening_count = self.employee_evening_counts[emp_id] + history['evening']
+            night_count = self.employee_night_counts[emp_id] + history['night']
 
             # Max and min shift type count for this employee
-            emp_max_type = self.model.NewIntVar(0, len(self.valid_shifts), f'emp_max_type_{emp_id}')
-            emp_min_type = self.model.NewIntVar(0, len(self.valid_shifts), f'emp_min_type_{emp_id}')
+            bound = len(self.valid_shifts) + self.history_bound
+            emp_max_type = self.model.NewIntVar(0, bound, f'emp_max_type_{emp_id}')
+            emp_min_type = self.model.NewIntVar(0, bound, f'emp_min_type_{emp_id}')
 
             self.model.AddMaxEquality(emp_max_type, [morning_count, evening_count, night_count])
             self.model.AddMinEquality(emp_min_type, [morning_count, evening_count, night_count])
 
             # Gap = difference between most and least frequent shift type for this employee
-            variety_gap = self.model.NewIntVar(0, len(self.valid_shifts), f'variety_gap_{emp_id}')
+            variety_gap = self.model.NewIntVar(0, bound, f'variety_gap_{emp_id}')
             self.model.Add(variety_gap == emp_max_type - emp_min_type)
             self.employee_variety_gaps[emp_id] = variety_gap
 
         print(f"✓ Created employee variety gap variables", file=sys.stderr)
         print(f"✓ Created auxiliary variables", file=sys.stderr)
 
-    def solve_with_priorities(self) -> Tuple[bool, dict]:
-        """
-        Solve using lexicographic optimization (priority order)
-
-        HARD CONSTRAINTS (MUST be satisfied):
-        - Maximum 1 shift per employee per day
-        - No morning after night shift
-        - **ZERO 8-8-8 patterns allowed** (3 consecutive shifts with 8h gaps - FORBIDDEN!)
-        - Employees on vacation/sick leave cannot be scheduled
-
-        OPTIMIZATION PRIORITIES (highest to lowest):
-        1. Minimize unfilled shifts (if someone available) - Weight: 1,000,000 (FIXED)
-        2. Penalize >1 eight-eight per employee - Weight: 100,000 (RELAXED - allows more 8-8)
-        3a. ⭐ EQUAL TOTAL SHIFTS ⭐ - Weight: 100,000 (FIXED - HEAVILY EMPHASIZED!)
-            Minimize gap between employee with most/least TOTAL shifts
-        3b. Ensure at least 1 morning per employee (if available) - Weight: 75,000 (FIXED)
-        4a. Shift type balance between employees - Weight: 20,000 (RELAXED - 8-8 preferred over forced balance)
-        4b. Minimize 8-8 patterns - Weight: 15,000 (RELAXED - 8-8 is acceptable)
-        4c. Per-employee variety - Weight: 10,000 (RELAXED - not critical)
-        5. Ensure minimum 3 shifts per employee (soft target) - Weight: ~100
-        6. Random tie-breaking for variety (1000-3000 per assignment) - Creates different schedules
-
-        SEARCH STRATEGY:
-        - Uses 8 parallel workers for extensive exploration
-        - Maximum 60 seconds search time
-        - Explores many solutions to find the absolute best (not just first good one)
-
-        Note: Fairness focuses on equal TOTAL shift count. Shift type balance (morning/evening/night)
-        is a lower priority - allowing 8-8 patterns is preferred over forcing equal type distribution.
-        """
-
-        solver = cp_model.CpSolver() 
+    def _create_solver(self, time_limit: float = 60.0) -> cp_model.CpSolver:
+        """Create a CP-SAT solver configured for extensive, randomized search"""
+        solver = cp_model.CpSolver()
 
         # AGGRESSIVE SEARCH: Allow much more time to explore many solutions
-        solver.parameters.max_time_in_seconds = 60.0  # Increased from 30s to 60s
+        solver.parameters.max_time_in_seconds = time_limit  # Default increased from 30s to 60s
         solver.parameters.log_search_progress = False
 
         # Enable extensive search to find the BEST solution
@@ -504,8 +672,36 @@ class ShiftSchedulingModel:
         # Instead, improve search quality
         solver.parameters.cp_model_probing_level = 2  # More aggressive probing
 
-        print(f"✓ Using random seed: {random_seed}", file=sys.stderr)
+        # Measured overrides from a parameter profile (time limits always come from the caller)
+        overrides = ' '.join(
+            f"{name}: {str(value).lower() if isinstance(value, bool) else value}"  # Enums by name, e.g. PORTFOLIO_SEARCH
+            for name, value in self.solver_parameters.items() if name != 'max_time_in_seconds'
+        )
+        if overrides:
+            if hasattr(solver.parameters, 'merge_text_format'):
+                solver.parameters.merge_text_format(overrides)
+            else:
+                from google.protobuf import text_format
+                text_format.Merge(overrides, solver.parameters)
+
+        print(f"✓ Using random seed: {solver.parameters.random_seed}", file=sys.stderr)
+
+        return solver
+
+    def _fairness_gap(self, max_var, min_var, kind: str, bound: int):
+        """max - min, or with fairness_bounds only the part outside the fixed global bounds"""
+        if not self.fairness_bounds:
+            return max_var - min_var
+
+        low, high = self.fairness_bounds[kind]
+        above = self.model.NewIntVar(0, bound, f'{kind}_above_bound')
+        below = self.model.NewIntVar(0, bound, f'{kind}_below_bound')
+        self.model.AddMaxEquality(above, [max_var - high, 0])
+        self.model.AddMaxEquality(below, [low - min_var, 0])
+        return above + below
 
+    def build_objective(self):
+        """Add the 8-8-8 hard limit and the weighted priority objective (see solve_with_priorities)"""
         # Objective 1: Minimize unfilled shifts (HIGHEST PRIORITY)
         total_unfilled = sum(self.shift_unfilled.values())
 
@@ -563,43 +759,59 @@ class ShiftSchedulingModel:
         print(f"✓ Morning shift: SOFT constraint (penalized in objective function)", file=sys.stderr)
 
         # Objective 5: Fairness - minimize gap between max and min shifts (TOTAL count)
-        max_shifts = self.model.NewIntVar(0, len(self.valid_shifts), 'max_shifts')
-        min_shifts = self.model.NewIntVar(0, len(self.valid_shifts), 'min_shifts')
-        self.model.AddMaxEquality(max_shifts, list(self.employee_shift_counts.values()))
-        self.model.AddMinEquality(min_shifts, list(self.employee_shift_counts.values()))
-        fairness_gap = max_shifts - min_shifts
+        # Rolling horizon: counts include previous weeks when historySummaries are given,
+        # so employees who were short before are preferred now (history is a constant offset)
+        count_bound = len(self.valid_shifts) + self.history_bound
+        cumulative_shift_counts = [
+            self.employee_shift_counts[emp_id] + sum(self.history_counts[emp_id].values())
+            for emp_id in self.employee_ids
+        ]
+        max_shifts = self.model.NewIntVar(0, count_bound, 'max_shifts')
+        min_shifts = self.model.NewIntVar(0, count_bound, 'min_shifts')
+        self.model.AddMaxEquality(max_shifts, cumulative_shift_counts)
+        self.model.AddMinEquality(min_shifts, cumulative_shift_counts)
+        fairness_gap = self._fairness_gap(max_shifts, min_shifts, 'total', count_bound)
 
         # Objective 5b: Fairness by SHIFT TYPE - ensure variety for each employee
         # Minimize gap in morning shifts between employees
-        morning_shift_counts = list(self.employee_morning_counts.values())
+        morning_shift_counts = [
+            self.employee_morning_counts[emp_id] + self.history_counts[emp_id]['morning']
+            for emp_id in self.employee_ids
+        ] if not self.light else []
         if morning_shift_counts:
-            max_morning = self.model.NewIntVar(0, len(self.valid_shifts), 'max_morning')
-            min_morning = self.model.NewIntVar(0, len(self.valid_shifts), 'min_morning')
+            max_morning = self.model.NewIntVar(0, count_bound, 'max_morning')
+            min_morning = self.model.NewIntVar(0, count_bound, 'min_morning')
             self.model.AddMaxEquality(max_morning, morning_shift_counts)
             self.model.AddMinEquality(min_morning, morning_shift_counts)
-            morning_fairness_gap = max_morning - min_morning
+            morning_fairness_gap = self._fairness_gap(max_morning, min_morning, 'morning', count_bound)
         else:
             morning_fairness_gap = 0
 
         # Minimize gap in evening shifts between employees
-        evening_shift_counts = list(self.employee_evening_counts.values())
+        evening_shift_counts = [
+            self.employee_evening_counts[emp_id] + self.history_counts[emp_id]['evening']
+            for emp_id in self.employee_ids
+        ] if not self.light else []
         if evening_shift_counts:
-            max_evening = self.model.NewIntVar(0, len(self.valid_shifts), 'max_evening')
-            min_evening = self.model.NewIntVar(0, len(self.valid_shifts), 'min_evening')
+            max_evening = self.model.NewIntVar(0, count_bound, 'max_evening')
+            min_evening = self.model.NewIntVar(0, count_bound, 'min_evening')
             self.model.AddMaxEquality(max_evening, evening_shift_counts)
             self.model.AddMinEquality(min_evening, evening_shift_counts)
-            evening_fairness_gap = max_evening - min_evening
+            evening_fairness_gap = self._fairness_gap(max_evening, min_evening, 'evening', count_bound)
         else:
             evening_fairness_gap = 0
 
         # Minimize gap in night shifts between employees
-        night_shift_counts = list(self.employee_night_counts.values())
+        night_shift_counts = [
+            self.employee_night_counts[emp_id] + self.history_counts[emp_id]['night']
+            for emp_id in self.employee_ids
+        ] if not self.light else []
         if night_shift_counts:
-            max_night = self.model.NewIntVar(0, len(self.valid_shifts), 'max_night')
-            min_night = self.model.NewIntVar(0, len(self.valid_shifts), 'min_night')
+            max_night = self.model.NewIntVar(0, count_bound, 'max_night')
+            min_night = self.model.NewIntVar(0, count_bound, 'min_night')
             self.model.AddMaxEquality(max_night, night_shift_counts)
             self.model.AddMinEquality(min_night, night_shift_counts)
-            night_fairness_gap = max_night - min_night
+            night_fairness_gap = self._fairness_gap(max_night, min_night, 'night', count_bound)
         else:
             night_fairness_gap = 0
 
@@ -625,21 +837,21 @@ class ShiftSchedulingModel:
         # This creates variety while maintaining schedule quality
 
         # Fixed priorities (must always be strict)
-        weight_unfilled = 1000000      # Priority 1: NEVER compromise on filling shifts
-        weight_excess_88 = 100000      # Priority 1b: Penalty for >1 eight-eight per employee (relaxed to allow more 8-8)
-        weight_88 = 15000              # Priority 2: Avoid 8-8 patterns (relaxed - 8-8 is acceptable)
+        weight_unfilled = OBJECTIVE_WEIGHTS['unfilled']  # Priority 1: NEVER compromise on filling shifts
+        weight_excess_88 = OBJECTIVE_WEIGHTS['excess_88']  # Priority 1b: Penalty for >1 eight-eight per employee (relaxed to allow more 8-8)
+        weight_88 = OBJECTIVE_WEIGHTS['eight_eight']  # Priority 2: Avoid 8-8 patterns (relaxed - 8-8 is acceptable)
 
         # FAIRNESS: Equal TOTAL shifts is top priority, shift type balance is relaxed
         # Allowing more 8-8 patterns is preferable to forcing equal morning/evening/night distribution
-        weight_fairness = 100000       # Priority 3a: EQUAL total shift count between employees (UNCHANGED)
-        weight_shift_type_fairness = 20000  # Priority 3b: Shift type balance (RELAXED - 8-8 is preferred over forced balance)
-        weight_variety = 10000         # Priority 3c: Per-employee mix (RELAXED - not critical)
+        weight_fairness = OBJECTIVE_WEIGHTS['fairness']  # Priority 3a: EQUAL total shift count between employees (UNCHANGED)
+        weight_shift_type_fairness = OBJECTIVE_WEIGHTS['shift_type_fairness']  # Priority 3b: Shift type balance (RELAXED - 8-8 is preferred over forced balance)
+        weight_variety = OBJECTIVE_WEIGHTS['variety']  # Priority 3c: Per-employee mix (RELAXED - not critical)
 
         # Randomized lower priorities (±15% variation creates different "flavors")
         # These weights can vary without compromising critical constraints
         # Note: 8-8 patterns now HARD constraint (removed from objective)
-        weight_morning = 200000                            # Priority 4: Morning shifts (FIXED - highest after unfilled!)
-        weight_min3 = random.randint(85, 115)              # Priority 5: Min 3 shifts (~100)
+        weight_morning = OBJECTIVE_WEIGHTS['morning']  # Priority 4: Morning shifts (FIXED - highest after unfilled!)
+        weight_min3 = random.randint(*MIN3_WEIGHT_RANGE)  # Priority 5: Min 3 shifts (~100)
 
         # Add STRONG random tie-breaking to generate DIFFERENT schedules with same perfect score
         # These weights (1000-3000) are now strong enough to affect WHICH specific shifts
@@ -649,7 +861,11 @@ class ShiftSchedulingModel:
         for emp_id in self.employee_ids:
             for day, shift in self.valid_shifts:
                 if (emp_id, day, shift) in self.x:
-                    random_weights[(emp_id, day, shift)] = random.randint(1000, 3000)
+                    random_weights[(emp_id, day, shift)] = random.randint(*TIE_BREAKER_RANGE)
+
+        # Kept so the evaluator can reproduce this exact objective value
+        self.weight_min3 = weight_min3
+        self.tie_breaker_weights = random_weights
 
         tie_breaker = sum(
             self.x[(emp_id, day, shift)] * random_weights[(emp_id, day, shift)]
@@ -679,8 +895,191 @@ class ShiftSchedulingModel:
 
         self.model.Minimize(objective)
 
+        # Kept for reporting after a solve
+        self.objective_terms = {
+            'total_unfilled': total_unfilled,
+            'total_888': total_888,
+            'total_88_count': total_88_count,
+            'total_excess_88': total_excess_88,
+            'total_no_morning': total_no_morning,
+            'employees_without_morning': employees_without_morning,
+            'fairness_gap': fairness_gap,
+            'total_variety_penalty': total_variety_penalty,
+            'shift_type_fairness': shift_type_fairness,
+            'morning_shift_counts': morning_shift_counts,
+            'evening_shift_counts': evening_shift_counts,
+            'night_shift_counts': night_shift_counts,
+            'morning_fairness_gap': morning_fairness_gap,
+            'evening_fairness_gap': evening_fairness_gap,
+            'night_fairness_gap': night_fairness_gap,
+            'total_under_3': total_under_3,
+        }
+
+    def solve_with_priorities(self, time_limit: float = 60.0,
+                              solution_callback: Optional[cp_model.CpSolverSolutionCallback] = None) -> Tuple[bool, dict]:
+        """
+        Solve using lexicographic optimization (priority order)
+
+        HARD CONSTRAINTS (MUST be satisfied):
+        - Maximum 1 shift per employee per day
+        - No morning after night shift
+        - **ZERO 8-8-8 patterns allowed** (3 consecutive shifts with 8h gaps - FORBIDDEN!)
+        - Employees on vacation/sick leave cannot be scheduled
+
+        OPTIMIZATION PRIORITIES (highest to lowest):
+        1. Minimize unfilled shifts (if someone available) - Weight: 1,000,000 (FIXED)
+        2. Penalize >1 eight-eight per employee - Weight: 100,000 (RELAXED - allows more 8-8)
+        3a. ⭐ EQUAL TOTAL SHIFTS ⭐ - Weight: 100,000 (FIXED - HEAVILY EMPHASIZED!)
+            Minimize gap between employee with most/least TOTAL shifts
+        3b. Ensure at least 1 morning per employee (if available) - Weight: 75,000 (FIXED)
+        4a. Shift type balance between employees - Weight: 20,000 (RELAXED - 8-8 preferred over forced balance)
+        4b. Minimize 8-8 patterns - Weight: 15,000 (RELAXED - 8-8 is acceptable)
+        4c. Per-employee variety - Weight: 10,000 (RELAXED - not critical)
+        5. Ensure minimum 3 shifts per employee (soft target) - Weight: ~100
+        6. Random tie-breaking for variety (1000-3000 per assignment) - Creates different schedules
+
+        SEARCH STRATEGY:
+        - Uses 8 parallel workers for extensive exploration
+        - Maximum 60 seconds search time (time_limit)
+        - Explores many solutions to find the absolute best (not just first good one)
+
+        Note: Fairness focuses on equal TOTAL shift count. Shift type balance (morning/evening/night)
+        is a lower priority - allowing 8-8 patterns is preferred over forcing equal type distribution.
+        """
+
+        solver = self._create_solver(time_limit)
+        if not hasattr(self, 'objective_terms'):
+            self.build_objective()
+
         print(f"✓ Solving with CP-SAT...", file=sys.stderr)
-        status = solver.Solve(self.model)
+        status = solver.Solve(self.model, solution_callback)
+
+        return self._extract_solution(solver, status)
+
+    def _lns_neighbourhood(self, kind: str, solver: cp_model.CpSolver, rng: random.Random) -> Set[Tuple[str, int, str]]:
+        """Pick the assignment variables to re-optimize in one LNS step"""
+        if kind == 'eight_eight':
+            # Employees with 8-8 patterns, plus one other employee to trade shifts with
+            employees = [e for e in self.employee_ids if solver.Value(self.eight_eight_violations[e]) > 0]
+            if employees:
+                others = [e for e in self.employee_ids if e not in employees]
+                employees += rng.sample(others, min(1, len(others)))
+                return {key for key in self.x if key[0] in employees}
+            kind = 'employees'  # No 8-8 patterns left - fall back to random employees
+
+        if kind == 'days':
+            # Window of 2 consecutive days for everyone
+            first_day = rng.randrange(self.num_days - 1)
+            return {key for key in self.x if first_day <= key[1] <= first_day + 1}
+
+        # Random subset of about a third of the employees
+        count = min(len(self.employee_ids), max(2, (len(self.employee_ids) + 2) // 3))
+        employees = rng.sample(self.employee_ids, count)
+        return {key for key in self.x if key[0] in employees}
+
+    def solve_with_lns(self, time_limit: float = 60.0, sub_time_limit: float = 2.0,
+                       initial_time_limit: float = 5.0) -> Tuple[bool, dict]:
+        """
+        Solve using Large Neighborhood Search around the same CP-SAT model
+
+        For big rosters the monolithic solve spends most of its time on marginal
+        gains. Instead: find a first schedule with a short full solve (hinted with
+        the greedy schedule, and extended until something is found), then
+        repeatedly free a neighbourhood (random employees, a window of days, or
+        the employees involved in 8-8 patterns), fix every other assignment to the
+        best schedule so far and re-optimize with a short sub-solve on a clone of
+        the model. Each improvement is logged with its time.
+        """
+        if not hasattr(self, 'objective_terms'):
+            self.build_objective()
+
+        start = time.time()
+        rng = random.Random()
+        improvements = []
+
+        # Hint the initial full solve with the greedy schedule (on a clone, so the
+        # sub-models below do not inherit these hints)
+        initial_model = self.model.Clone()
+        greedy = ScheduleEvaluator(self.data).construct_greedy()
+        for (emp_id, day, shift), var in self.x.items():
+            initial_model.AddHint(initial_model.GetBoolVarFromProtoIndex(var.Index()), int(greedy[day][shift] == emp_id))
+
+        print(f"✓ LNS: initial solve ({min(initial_time_limit, time_limit):.1f}s)...", file=sys.stderr)
+        best_solver = self._create_solver(min(initial_time_limit, time_limit))
+        best_status = best_solver.Solve(initial_model)
+        remaining = time_limit - (time.time() - start)
+        if best_status == cp_model.UNKNOWN and remaining >= 0.1:
+            # Nothing yet - spend the rest of the budget on a first schedule rather than give up
+            print(f"✓ LNS: no schedule yet, searching up to {remaining:.1f}s for a first one...", file=sys.stderr)
+            best_solver = self._create_solver(remaining)
+            best_solver.parameters.stop_after_first_solution = True
+            best_status = best_solver.Solve(initial_model)
+        if best_status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            return self._extract_solution(best_solver, best_status)
+
+        best_objective = round(best_solver.ObjectiveValue())
+        # Only a full solve bounds the real objective - sub-model bounds do not
+        best_bound = best_solver.BestObjectiveBound()
+        improvements.append({'time_seconds': time.time() - start, 'objective': best_objective, 'neighbourhood': 'initial'})
+        print(f"✓ LNS: initial objective {best_objective} after {time.time() - start:.2f}s", file=sys.stderr)
+
+        neighbourhoods = ['employees', 'days', 'eight_eight']
+        iterations = 0
+        while best_status != cp_model.OPTIMAL:
+            remaining = time_limit - (time.time() - start)
+            if remaining < 0.1:
+                break
+
+            kind = neighbourhoods[iterations % len(neighbourhoods)]
+            freed = self._lns_neighbourhood(kind, best_solver, rng)
+            iterations += 1
+
+            # Fix everything outside the neighbourhood to the best schedule so far
+            sub_model = self.model.Clone()
+            for key, var in self.x.items():
+                sub_var = sub_model.GetBoolVarFromProtoIndex(var.Index())
+                value = best_solver.Value(var)
+                if key in freed:
+                    sub_model.AddHint(sub_var, value)
+                else:
+                    sub_model.Add(sub_var == value)
+
+            sub_solver = self._create_solver(min(sub_time_limit, remaining))
+            sub_status = sub_solver.Solve(sub_model)
+            if sub_status in [cp_model.OPTIMAL, cp_model.FEASIBLE] and round(sub_solver.ObjectiveValue()) < best_objective:
+                best_solver, best_objective = sub_solver, round(sub_solver.ObjectiveValue())
+                elapsed = time.time() - start
+                improvements.append({'time_seconds': elapsed, 'objective': best_objective, 'neighbourhood': kind})
+                print(f"✓ LNS: iteration {iterations} ({kind}, {len(freed)} free) improved to {best_objective} after {elapsed:.2f}s", file=sys.stderr)
+
+        # Sub-solves cannot prove optimality of the full model, so report FEASIBLE
+        # unless the initial full solve already did
+        success, result = self._extract_solution(best_solver, best_status)
+        if success:
+            result['stats']['solve_time_seconds'] = time.time() - start
+            result['stats']['best_objective_bound'] = best_bound
+            result['stats']['lns_iterations'] = iterations
+            result['stats']['lns_improvements'] = improvements
+        return success, result
+
+    def _extract_solution(self, solver: cp_model.CpSolver, status) -> Tuple[bool, dict]:
+        """Log the objective breakdown and read the assignments out of a finished solve"""
+        total_unfilled = self.objective_terms['total_unfilled']
+        total_888 = self.objective_terms['total_888']
+        total_88_count = self.objective_terms['total_88_count']
+        total_excess_88 = self.objective_terms['total_excess_88']
+        total_no_morning = self.objective_terms['total_no_morning']
+        employees_without_morning = self.objective_terms['employees_without_morning']
+        fairness_gap = self.objective_terms['fairness_gap']
+        total_variety_penalty = self.objective_terms['total_variety_penalty']
+        shift_type_fairness = self.objective_terms['shift_type_fairness']
+        morning_shift_counts = self.objective_terms['morning_shift_counts']
+        evening_shift_counts = self.objective_terms['evening_shift_counts']
+        night_shift_counts = self.objective_terms['night_shift_counts']
+        morning_fairness_gap = self.objective_terms['morning_fairness_gap']
+        evening_fairness_gap = self.objective_terms['evening_fairness_gap']
+        night_fairness_gap = self.objective_terms['night_fairness_gap']
+        total_under_3 = self.objective_terms['total_under_3']
 
         if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             print(f"✓ Solution found! Status: {'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE'}", file=sys.stderr)
@@ -730,7 +1129,8 @@ class ShiftSchedulingModel:
 
             # Calculate statistics
             stats = {
-                'objective_value': solver.ObjectiveValue(),
+                # All weights are integers; the float sum can drift (e.g. 1352839.0000000002)
+                'objective_value': round(solver.ObjectiveValue()),
                 'unfilled_shifts': solver.Value(total_unfilled),
                 'eight_eight_eight_violations': solver.Value(total_888),
                 'eight_eight_patterns': solver.Value(total_88_count),  # Total 8-8 patterns
@@ -741,6 +1141,8 @@ class ShiftSchedulingModel:
                 'shift_type_fairness': solver.Value(shift_type_fairness),
                 'employees_under_3_shifts': solver.Value(total_under_3),
                 'solve_time_seconds': solver.WallTime(),
+                'best_objective_bound': solver.BestObjectiveBound(),
+                'status': solver.StatusName(status),
                 'employee_shift_counts': {
                     emp_id: solver.Value(self.employee_shift_counts[emp_id])
                     for emp_id in self.employee_ids
@@ -758,6 +1160,645 @@ class ShiftSchedulingModel:
             return False, {'error': 'UNKNOWN', 'message': f'Solver status: {status}'}
 
 
+class ScheduleEvaluator(ScheduleInstance):
+    """
+    Scores a complete assignments grid without building a CP-SAT model
+
+    Mirrors the hard constraints of add_hard_constraints() and every objective
+    component of solve_with_priorities(), computed on numpy arrays of shape
+    [employee, day, shift] so a manual edit can be checked in well under 10ms.
+    """
+
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.emp_index = {emp_id: e for e, emp_id in enumerate(self.employee_ids)}
+        self.available = self.availability_array()
+        shape = (self.num_days, len(self.shifts))
+
+        # Shifts the objective counts as unfilled (valid and someone available)
+        self.fillable = self.available.any(axis=0)
+
+        # What add_hard_constraints() requires for each shift:
+        # required = exactly 1 employee, frozen_empty = nobody, frozen_to = that employee
+        self.required = np.zeros(shape, dtype=bool)
+        self.frozen_empty = np.zeros(shape, dtype=bool)
+        self.frozen_to = np.full(shape, -1, dtype=int)
+        for day, shift in self.valid_shifts:
+            s = self.shift_index[shift]
+            is_frozen, frozen_emp_id = self._is_shift_frozen(day, shift)
+            if is_frozen and (frozen_emp_id is None or '119' in str(frozen_emp_id)):
+                self.frozen_empty[day, s] = True
+            elif is_frozen and frozen_emp_id not in self.emp_index:
+                continue  # Unknown frozen employee - the solver adds no constraint
+            elif is_frozen and self.available[self.emp_index[frozen_emp_id], day, s]:
+                self.frozen_to[day, s] = self.emp_index[frozen_emp_id]
+                self.required[day, s] = True
+            elif self.fillable[day, s]:
+                self.required[day, s] = True
+
+        # Employees who could get a weekday (Sun-Thu) morning at all
+        self.morning_eligible = self.available[:, :5, 0].any(axis=1)
+
+        # historySummaries: previous-weeks totals [employee, shift type] and the
+        # shifts worked on the 2 days before the week [employee, day -2..-1, shift]
+        self.history_type_counts = np.array(
+            [[self.history_counts[emp_id][shift] for shift in self.shifts] for emp_id in self.employee_ids],
+            dtype=np.int64
+        ).reshape(len(self.employee_ids), len(self.shifts))
+        self.history_prefix = np.zeros((len(self.employee_ids), 2, len(self.shifts)), dtype=np.int64)
+        for emp_id, shifts in self.previous_shifts.items():
+            for offset, shift in shifts.items():
+                self.history_prefix[self.emp_index[emp_id], offset + 2, self.shift_index[shift]] = 1
+
+    def _with_history(self, x: np.ndarray) -> np.ndarray:
+        """Prepend the 2 days before the week so rest rules see across the boundary"""
+        prefix = np.broadcast_to(self.history_prefix, x.shape[:-3] + self.history_prefix.shape)
+        return np.concatenate([prefix, x], axis=-2)
+
+    def _assignment_array(self, assignments: dict) -> Tuple[np.ndarray, List[dict]]:
+        """Convert a {day: {shift: employeeId}} grid into a 0/1 [employee, day, shift] array"""
+        x = np.zeros((len(self.employee_ids), self.num_days, len(self.shifts)), dtype=np.int64)
+        violations = []
+
+        for day_key, day_shifts in (assignments or {}).items():
+            day = int(day_key)
+            for shift, emp_id in (day_shifts or {}).items():
+                if not emp_id or '119' in str(emp_id):
+                    continue  # Empty, or covered by the 119 emergency service
+                if emp_id not in self.emp_index:
+                    violations.append({'rule': 'unknown_employee', 'day': day, 'shift': shift, 'employeeId': emp_id})
+                    continue
+                if shift not in self.shift_index or not 0 <= day < self.num_days \
+                        or not self.valid_mask[day, self.shift_index[shift]]:
+                    violations.append({'rule': 'invalid_shift', 'day': day, 'shift': shift, 'employeeId': emp_id})
+                    continue
+                x[self.emp_index[emp_id], day, self.shift_index[shift]] = 1
+
+        return x, violations
+
+    def _hard_violations(self, x: np.ndarray) -> List[dict]:
+        """Find every assignment the CP-SAT model would reject"""
+        violations = []
+
+        def report(rule: str, cells: np.ndarray, with_employee: bool = True, shift: Optional[str] = None):
+            for cell in np.argwhere(cells):
+                entry = {'rule': rule}
+                if with_employee:
+                    entry['employeeId'] = self.employee_ids[cell[0]]
+                    cell = cell[1:]
+                entry['day'] = int(cell[0])
+                entry['shift'] = shift if shift is not None else self.shifts[cell[1]]
+                violations.append(entry)
+
+        assigned = x.sum(axis=0)
+        report('unavailable', (x == 1) & ~self.available)
+        report('unfilled', self.required & (assigned == 0), with_employee=False)
+        report('frozen_empty', self.frozen_empty & (assigned > 0), with_employee=False)
+
+        frozen_cells = self.frozen_to >= 0
+        frozen_held = np.zeros_like(frozen_cells)
+        days, shifts = np.nonzero(frozen_cells)
+        frozen_held[days, shifts] = x[self.frozen_to[days, shifts], days, shifts] == 1
+        report('frozen', frozen_cells & ~frozen_held, with_employee=False)
+
+        report('double_shift', x.sum(axis=2) > 1, shift='any')
+
+        # Rest rules, reported on the morning that breaks them (may follow last week's shifts)
+        xh = self._with_history(x)
+        report('morning_after_night', (xh[:, 1:-1, 2] & xh[:, 2:, 0]) == 1, shift='morning')
+        report('eight_eight_eight', (xh[:, :-2, 2] & xh[:, 1:-1, 1] & xh[:, 2:, 0]) == 1, shift='morning')
+
+        return violations
+
+    def _score(self, x: np.ndarray, weight_min3: Optional[int] = None,
+               tie_breaker: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Objective components for a batch of schedules
+
+        x has shape [batch, employee, day, shift]; every returned array has one
+        entry per schedule in the batch (employee_shift_counts is [batch, employee]).
+        """
+        # Counts per employee (morning count is Sun-Thu only, as in the solver)
+        morning = x[:, :, :5, 0].sum(axis=2)
+        evening = x[:, :, :, 1].sum(axis=2)
+        night = x[:, :, :, 2].sum(axis=2)
+        total = x.sum(axis=(2, 3))
+
+        # Fairness and variety use cumulative counts (history is zero without historySummaries)
+        history = self.history_type_counts
+        morning_cumulative = morning + history[:, 0]
+        evening_cumulative = evening + history[:, 1]
+        night_cumulative = night + history[:, 2]
+        total_cumulative = total + history.sum(axis=1)
+
+        # 8-8: evening→morning and night→evening on consecutive days, starting from
+        # the day before the week; 8-8-8 from 2 days before
+        xh = self._with_history(x)
+        eight_eight = (xh[:, :, 1:-1, 1] & xh[:, :, 2:, 0]).sum(axis=2) + (xh[:, :, 1:-1, 2] & xh[:, :, 2:, 1]).sum(axis=2)
+        eight_eight_eight = (xh[:, :, :-2, 2] & xh[:, :, 1:-1, 1] & xh[:, :, 2:, 0]).sum(axis=(1, 2))
+
+        def gap(counts: np.ndarray) -> np.ndarray:
+            if not counts.shape[-1]:
+                return np.zeros(counts.shape[:-1], dtype=np.int64)
+            return counts.max(axis=-1) - counts.min(axis=-1)
+
+        morning_gap, evening_gap, night_gap = gap(morning_cumulative), gap(evening_cumulative), gap(night_cumulative)
+        type_counts = np.stack([morning_cumulative, evening_cumulative, night_cumulative], axis=-1)
+
+        components = {
+            'unfilled_shifts': (self.fillable & (x.sum(axis=1) == 0)).sum(axis=(1, 2)),
+            'eight_eight_eight_violations': eight_eight_eight,
+            'eight_eight_patterns': eight_eight.sum(axis=1),
+            'employees_with_excess_88': (eight_eight >= 2).sum(axis=1),
+            'employees_without_morning': (self.morning_eligible & (morning == 0)).sum(axis=1),
+            'fairness_gap': gap(total_cumulative),
+            'variety_penalty': gap(type_counts).sum(axis=1),
+            'shift_type_fairness': morning_gap + evening_gap + night_gap,
+            'morning_fairness_gap': morning_gap,
+            'evening_fairness_gap': evening_gap,
+            'night_fairness_gap': night_gap,
+            'employees_under_3_shifts': (total < 3).sum(axis=1),
+            'employee_shift_counts': total,
+        }
+
+        if weight_min3 is None:
+            weight_min3 = sum(MIN3_WEIGHT_RANGE) // 2
+        objective = (
+            components['unfilled_shifts'] * OBJECTIVE_WEIGHTS['unfilled'] +
+            components['employees_with_excess_88'] * OBJECTIVE_WEIGHTS['excess_88'] +
+            components['eight_eight_patterns'] * OBJECTIVE_WEIGHTS['eight_eight'] +
+            components['variety_penalty'] * OBJECTIVE_WEIGHTS['variety'] +
+            components['fairness_gap'] * OBJECTIVE_WEIGHTS['fairness'] +
+            components['shift_type_fairness'] * OBJECTIVE_WEIGHTS['shift_type_fairness'] +
+            components['employees_without_morning'] * OBJECTIVE_WEIGHTS['morning'] +
+            components['employees_under_3_shifts'] * weight_min3
+        )
+        if tie_breaker is not None:
+            objective = objective + (x * tie_breaker).sum(axis=(1, 2, 3))
+        components['objective_value'] = objective
+
+        # Hard rest rules, counted so callers can compare a change against its base
+        components['hard_rule_breaks'] = (
+            (x.sum(axis=3) > 1).sum(axis=(1, 2)) +
+            (xh[:, :, 1:-1, 2] & xh[:, :, 2:, 0]).sum(axis=(1, 2)) +
+            eight_eight_eight
+        )
+        return components
+
+    def _stats_from_components(self, components: Dict[str, np.ndarray], i: int = 0) -> dict:
+        """Plain-JSON stats for schedule i of a scored batch"""
+        stats = {
+            key: int(values[i]) for key, values in components.items()
+            if key not in ('employee_shift_counts', 'objective_value', 'hard_rule_breaks')
+        }
+        stats['employee_shift_counts'] = {
+            emp_id: int(components['employee_shift_counts'][i, e]) for e, emp_id in enumerate(self.employee_ids)
+        }
+        stats['objective_value'] = float(components['objective_value'][i])
+        return stats
+
+    def evaluate(self, assignments: dict, weight_min3: Optional[int] = None,
+                 tie_breaker_weights: Optional[Dict[Tuple[str, int, str], int]] = None) -> dict:
+        """
+        Score an assignments grid
+
+        weight_min3 defaults to the middle of MIN3_WEIGHT_RANGE. Pass the weights
+        a solve actually used (ShiftSchedulingModel.weight_min3 / tie_breaker_weights)
+        to reproduce its objective value exactly.
+        """
+        start = time.perf_counter()
+        x, violations = self._assignment_array(assignments)
+        violations += self._hard_violations(x)
+
+        tie_breaker = None
+        if tie_breaker_weights:
+            tie_breaker = np.zeros(x.shape, dtype=np.int64)
+            for (emp_id, day, shift), weight in tie_breaker_weights.items():
+                tie_breaker[self.emp_index[emp_id], day, self.shift_index[shift]] = weight
+
+        stats = self._stats_from_components(self._score(x[np.newaxis], weight_min3, tie_breaker))
+        stats['evaluate_time_seconds'] = time.perf_counter() - start
+
+        return {
+            'feasible': not violations,
+            'hard_violations': violations,
+            'stats': stats
+        }
+
+    def suggest_replacement(self, assignments: dict, day: int, shift: str,
+                            allow_swaps: bool = False, max_swaps: int = 10) -> dict:
+        """
+        Rank replacements for one shift, holding the rest of the schedule fixed
+
+        The current holder (e.g. someone who called in sick) is removed and every
+        other employee available for the shift is scored in a single vectorized
+        batch. With allow_swaps, also tries one-hop swaps: a candidate moves in
+        from one of their own shifts and a third employee covers that shift.
+        Deltas are relative to the schedule as given. On a frozen cell only the
+        frozen employee can be feasible (nobody, if it is frozen empty or to 119).
+        """
+        start = time.perf_counter()
+        if shift not in self.shift_index or not 0 <= day < self.num_days \
+                or not self.valid_mask[day, self.shift_index[shift]]:
+            raise ValueError(f"Day {day} {shift} is not a valid shift")
+        s = self.shift_index[shift]
+
+        x, _ = self._assignment_array(assignments)
+        current = x[:, day, s].nonzero()[0]
+        vacated = x.copy()
+        vacated[:, day, s] = 0
+
+        # Reference score (the schedule as given) and the vacated base
+        base = self._score(np.stack([x, vacated]))
+        reference_objective = base['objective_value'][0]
+
+        candidates = [e for e in np.nonzero(self.available[:, day, s])[0] if e not in current]
+        moves = [(e, None, None) for e in candidates]
+        # Frozen cells accept nobody (frozen empty / 119) or only the frozen employee
+        frozen_ok = lambda e: not self.frozen_empty[day, s] and self.frozen_to[day, s] in (-1, e)
+
+        if allow_swaps:
+            for e in candidates:
+                for d2, s2 in zip(*np.nonzero(vacated[e])):
+                    if self.frozen_to[d2, s2] >= 0:
+                        continue
+                    for f in np.nonzero(self.available[:, d2, s2])[0]:
+                        if f != e and f not in current:
+                            moves.append((e, (int(d2), int(s2)), f))
+
+        batch = np.repeat(vacated[np.newaxis], len(moves), axis=0)
+        for i, (e, freed, f) in enumerate(moves):
+            batch[i, e, day, s] = 1
+            if freed is not None:
+                batch[i, e, freed[0], freed[1]] = 0
+                batch[i, f, freed[0], freed[1]] = 1
+
+        scores = self._score(batch) if moves else None
+        delta_keys = ['eight_eight_patterns', 'employees_with_excess_88', 'fairness_gap',
+                      'variety_penalty', 'shift_type_fairness', 'employees_without_morning',
+                      'employees_under_3_shifts']
+
+        replacements, swaps = [], []
+        for i, (e, freed, f) in enumerate(moves):
+            new_breaks = scores['hard_rule_breaks'][i] - base['hard_rule_breaks'][1]
+            entry = {
+                'employeeId': self.employee_ids[e],
+                'feasible': bool(new_breaks <= 0 and frozen_ok(e)),
+                'objective_value': float(scores['objective_value'][i]),
+                'delta': float(scores['objective_value'][i] - reference_objective),
+                'changes': {
+                    key: int(scores[key][i] - base[key][0])
+                    for key in delta_keys if scores[key][i] != base[key][0]
+                }
+            }
+            if freed is None:
+                replacements.append(entry)
+            elif entry['feasible']:
+                entry['swap'] = {'day': freed[0], 'shift': self.shifts[freed[1]], 'coveredBy': self.employee_ids[f]}
+                swaps.append(entry)
+
+        # Feasible moves first, then by objective delta
+        rank = lambda entry: (not entry['feasible'], entry['delta'])
+        replacements.sort(key=rank)
+        swaps.sort(key=rank)
+
+        return {
+            'day': day,
+            'shift': shift,
+            'currentEmployeeId': self.employee_ids[current[0]] if len(current) else None,
+            'replacements': replacements,
+            'swaps': swaps[:max_swaps],
+            'stats': {
+                'reference_objective': float(reference_objective),
+                'candidates_evaluated': len(moves),
+                'evaluate_time_seconds': time.perf_counter() - start
+            }
+        }
+
+    def construct_greedy(self) -> dict:
+        """
+        Fast constructive heuristic (race mode)
+
+        Keeps frozen employees, then fills the remaining shifts most constrained
+        first, each with the employee whose assignment scores best without
+        breaking a hard rule. Shifts nobody can take without breaking one stay empty.
+        """
+        x = np.zeros((len(self.employee_ids), self.num_days, len(self.shifts)), dtype=np.int64)
+        days, shifts = np.nonzero(self.frozen_to >= 0)
+        x[self.frozen_to[days, shifts], days, shifts] = 1
+
+        open_shifts = [(d, s) for d, s in zip(*np.nonzero(self.required & (self.frozen_to < 0)))]
+        open_shifts.sort(key=lambda cell: (self.available[:, cell[0], cell[1]].sum(), cell))
+        for day, s in open_shifts:
+            candidates = np.nonzero(self.available[:, day, s])[0]
+            batch = np.repeat(x[np.newaxis], len(candidates), axis=0)
+            batch[np.arange(len(candidates)), candidates, day, s] = 1
+            scores = self._score(batch)
+            base_breaks = self._score(x[np.newaxis])['hard_rule_breaks'][0]
+            allowed = scores['hard_rule_breaks'] <= base_breaks
+            if allowed.any():
+                best = np.argmin(np.where(allowed, scores['objective_value'], np.inf))
+                x[candidates[best], day, s] = 1
+
+        assignments = {}
+        for day in range(self.num_days):
+            assignments[day] = {}
+            for s, shift in enumerate(self.shifts):
+                assigned = np.nonzero(x[:, day, s])[0]
+                assignments[day][shift] = self.employee_ids[assigned[0]] if len(assigned) else None
+        return assignments
+
+
+def _race_worker(strategy: str, data: dict, time_limit: float, workers: int, results: multiprocessing.Queue):
+    """Run one race strategy in its own process and report its schedule"""
+    start = time.time()
+    try:
+        if strategy == 'constructive':
+            assignments, status = ScheduleEvaluator(data).construct_greedy(), 'HEURISTIC'
+        else:
+            model = ShiftSchedulingModel(data, light=(strategy == 'light'))
+            model.solver_parameters = dict(model.solver_parameters, num_search_workers=workers)
+            model.add_hard_constraints()
+            model.create_auxiliary_variables()
+            success, result = model.solve_with_priorities(time_limit)
+            assignments = result.get('assignments')
+            status = result['stats']['status'] if success else result['error']
+        results.put({'strategy': strategy, 'assignments': assignments, 'status': status, 'seconds': time.time() - start})
+    except Exception as e:
+        results.put({'strategy': strategy, 'assignments': None, 'status': 'EXCEPTION', 'message': str(e),
+                     'seconds': time.time() - start})
+
+
+def solve_race(data: dict, time_limit: float = 60.0, cores: Optional[int] = None) -> Tuple[bool, dict]:
+    """
+    Race a portfolio of strategies in separate processes on a fixed core budget
+
+    - weighted: the full CP-SAT model (solve_with_priorities)
+    - light: the same model without variety and shift-type fairness terms
+    - constructive: the greedy heuristic of ScheduleEvaluator
+
+    Stops when the weighted model proves optimality (the only proof that covers
+    the real objective) or at the deadline. Every schedule is validated and
+    scored by the evaluator on the full objective, and the best valid one wins.
+
+    Never runs more busy processes than cores: below 3 cores the heuristic runs
+    first in this process, and with 1 core the light model is skipped.
+    """
+    start = time.time()
+    cores = max(1, cores or os.cpu_count() or 1)
+    finished = {}
+    if cores >= 3:
+        # The heuristic takes one core briefly; the two CP-SAT models share the rest
+        workers = {'weighted': cores // 2, 'light': (cores - 1) // 2, 'constructive': 1}
+    else:
+        workers = {'weighted': 1, 'light': 1} if cores == 2 else {'weighted': 1}
+        inline = queue.Queue()
+        _race_worker('constructive', data, time_limit, 1, inline)
+        finished['constructive'] = inline.get()
+    print(f"🏁 Race on {cores} cores: {workers}", file=sys.stderr)
+
+    results = multiprocessing.Queue()
+    cp_time_limit = max(0.1, time_limit - (time.time() - start))
+    processes = {
+        strategy: multiprocessing.Process(
+            target=_race_worker, args=(strategy, data, cp_time_limit, workers[strategy], results), daemon=True
+        )
+        for strategy in RACE_STRATEGIES if strategy in workers
+    }
+    for process in processes.values():
+        process.start()
+
+    deadline = start + time_limit + RACE_GRACE_SECONDS
+    while any(strategy not in finished for strategy in processes):
+        try:
+            result = results.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            print(f"⏱️  Race deadline reached", file=sys.stderr)
+            break
+        finished[result['strategy']] = result
+        print(f"🏁 {result['strategy']} finished: {result['status']} after {result['seconds']:.2f}s", file=sys.stderr)
+        if result['strategy'] == 'weighted' and result['status'] == 'OPTIMAL':
+            break
+
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    # Validate and score every schedule on the same (full) objective
+    evaluator = ScheduleEvaluator(data)
+    race = {}
+    best = None
+    for strategy in RACE_STRATEGIES:
+        result = finished.get(strategy)
+        if result is None:
+            race[strategy] = {'status': 'STOPPED' if strategy in processes else 'SKIPPED', 'seconds': None}
+            continue
+        race[strategy] = {'status': result['status'], 'seconds': result['seconds']}
+        if result['assignments'] is None:
+            continue
+        evaluation = evaluator.evaluate(result['assignments'])
+        race[strategy]['feasible'] = evaluation['feasible']
+        race[strategy]['objective_value'] = evaluation['stats']['objective_value']
+        if evaluation['feasible'] and (best is None or evaluation['stats']['objective_value'] < best[2]['stats']['objective_value']):
+            best = (strategy, result, evaluation)
+
+    if best is None:
+        print(f"✗ No strategy produced a valid schedule", file=sys.stderr)
+        return False, {'error': 'NO_SOLUTION', 'message': 'No strategy produced a valid schedule', 'race': race}
+
+    strategy, result, evaluation = best
+    print(f"✓ Race won by {strategy} (objective {evaluation['stats']['objective_value']})", file=sys.stderr)
+    stats = evaluation['stats']
+    stats['strategy'] = strategy
+    stats['solve_time_seconds'] = time.time() - start
+    stats['race'] = race
+    return True, {'assignments': result['assignments'], 'stats': stats}
+
+
+def _ideal_count_range(offsets: List[int], units: int) -> Tuple[int, int]:
+    """Tightest (min, max) of offset + count when units are spread as evenly as possible"""
+    counts = list(offsets)
+    heapq.heapify(counts)
+    for _ in range(units if counts else 0):
+        heapq.heapreplace(counts, counts[0] + 1)
+    return (min(counts), max(counts)) if counts else (0, 0)
+
+
+def _solve_component(args: Tuple[dict, dict, float, int]) -> dict:
+    """Solve one independent sub-problem (decompose mode worker process)"""
+    data, fairness_bounds, time_limit, workers = args
+    start = time.time()
+    model = ShiftSchedulingModel(data)
+    model.fairness_bounds = fairness_bounds
+    model.solver_parameters = dict(model.solver_parameters, num_search_workers=workers)
+    model.add_hard_constraints()
+    model.create_auxiliary_variables()
+    success, result = model.solve_with_priorities(time_limit)
+    return {'success': success, 'result': result, 'seconds': time.time() - start}
+
+
+def solve_decomposed(data: dict, time_limit: float = 60.0, cores: Optional[int] = None,
+                     baseline: bool = False) -> Tuple[bool, dict]:
+    """
+    Solve independent sub-problems as separate CP-SAT models in parallel
+
+    Components come from ScheduleInstance.interaction_components(). They are
+    only coupled by the global fairness max/min terms, which are fixed to the
+    tightest achievable bounds (the even spread of each component's shifts,
+    across all components); each sub-model is only penalized for leaving them.
+    The merged schedule is validated and scored on the full objective by the
+    evaluator. With a single component this is the normal solve.
+
+    With baseline=True the single CpModel is also solved on the same core budget
+    afterwards, to report the real speedup of decomposing.
+    """
+    start = time.time()
+    instance = ScheduleInstance(data)
+    components = instance.interaction_components()
+    solvable = [(employees, cells) for employees, cells in components if employees and cells]
+    print(f"🧩 Found {len(solvable)} independent components "
+          f"({[len(cells) for _, cells in solvable]} shifts)", file=sys.stderr)
+
+    cores = cores or os.cpu_count() or 1
+    if len(solvable) <= 1:
+        model = ShiftSchedulingModel(data)
+        model.solver_parameters = dict(model.solver_parameters, num_search_workers=cores)
+        model.add_hard_constraints()
+        model.create_auxiliary_variables()
+        success, result = model.solve_with_priorities(time_limit)
+        if success:
+            result['stats']['decomposition'] = {'components': len(solvable), 'decomposed': False}
+        return success, result
+
+    # Fix the global fairness terms: bounds over every component (including
+    # employees who cannot take any shift) of its ideal count range
+    kinds = {
+        'total': lambda day, shift: True,
+        'morning': lambda day, shift: shift == 'morning' and day < 5,  # Sun-Thu, as in the model
+        'evening': lambda day, shift: shift == 'evening',
+        'night': lambda day, shift: shift == 'night',
+    }
+    fairness_bounds = {}
+    for kind, counts in kinds.items():
+        ranges = []
+        for employees, cells in components:
+            if not employees:
+                continue
+            offsets = [
+                sum(instance.history_counts[e].values()) if kind == 'total' else instance.history_counts[e][kind]
+                for e in employees
+            ]
+            ranges.append(_ideal_count_range(offsets, sum(1 for day, shift in cells if counts(day, shift))))
+        fairness_bounds[kind] = (min(low for low, _ in ranges), max(high for _, high in ranges))
+    print(f"🧩 Fixed fairness bounds: {fairness_bounds}", file=sys.stderr)
+
+    # One sub-input per component: its employees, every other shift frozen empty,
+    # and history normalized globally (weeks: 1) so averages do not change
+    tasks = []
+    for employees, cells in solvable:
+        cell_set = set(cells)
+        frozen = {}
+        for day, shift in instance.valid_shifts:
+            is_frozen, frozen_emp_id = instance._is_shift_frozen(day, shift)
+            if (day, shift) not in cell_set:
+                frozen.setdefault(str(day), {})[shift] = None
+            elif is_frozen:
+                frozen.setdefault(str(day), {})[shift] = frozen_emp_id
+        sub_data = dict(
+            data,
+            employees=[instance.employees[e] for e in employees],
+            availabilities=[a for a in data.get('availabilities', []) if a['employeeId'] in employees],
+            vacations=[v for v in data.get('vacations', []) if v['employeeId'] in employees],
+            frozenAssignments=frozen,
+            historySummaries=[
+                {
+                    'employeeId': e,
+                    'weeks': 1,
+                    'shiftCounts': instance.history_counts[e],
+                    'lastShifts': [
+                        {'date': instance._get_date_for_day(offset), 'shift': shift}
+                        for offset, shift in instance.previous_shifts.get(e, {}).items()
+                    ]
+                }
+                for e in employees
+            ] if data.get('historySummaries') else []
+        )
+        tasks.append(sub_data)
+
+    processes = min(cores, len(tasks))
+    workers = max(1, cores // processes)
+    with multiprocessing.Pool(processes) as pool:
+        outcomes = pool.map(_solve_component, [(task, fairness_bounds, time_limit, workers) for task in tasks])
+    wall_seconds = time.time() - start
+
+    component_stats = [
+        {
+            'employees': len(employees),
+            'shifts': len(cells),
+            'status': outcome['result']['stats']['status'] if outcome['success'] else outcome['result']['error'],
+            'seconds': outcome['seconds']
+        }
+        for (employees, cells), outcome in zip(solvable, outcomes)
+    ]
+    if not all(outcome['success'] for outcome in outcomes):
+        print(f"✗ A component has no solution", file=sys.stderr)
+        return False, {'error': 'INFEASIBLE', 'message': 'A component has no solution with given constraints',
+                       'decomposition': {'components': component_stats}}
+
+    # Merge: every shift belongs to exactly one component (or to none and stays empty)
+    assignments = {day: {shift: None for shift in instance.shifts} for day in range(instance.num_days)}
+    for (_, cells), outcome in zip(solvable, outcomes):
+        for day, shift in cells:
+            assignments[day][shift] = outcome['result']['assignments'][day][shift]
+
+    evaluation = ScheduleEvaluator(data).evaluate(assignments)
+    if not evaluation['feasible']:
+        print(f"✗ Merged schedule breaks hard rules: {evaluation['hard_violations']}", file=sys.stderr)
+        return False, {'error': 'INVALID_MERGE', 'message': 'Merged schedule breaks hard rules',
+                       'hard_violations': evaluation['hard_violations']}
+
+    component_seconds = sum(c['seconds'] for c in component_stats)
+    stats = evaluation['stats']
+    stats['solve_time_seconds'] = wall_seconds
+    stats['decomposition'] = {
+        'components': component_stats,
+        'decomposed': True,
+        'isolated_employees': sum(1 for employees, cells in components if employees and not cells),
+        'isolated_shifts': sum(1 for employees, cells in components if cells and not employees),
+        'fairness_bounds': fairness_bounds,
+        'processes': processes,
+        'sum_component_seconds': component_seconds,
+        # How well the pool overlapped the components - not the gain over one model
+        'parallel_efficiency': component_seconds / wall_seconds if wall_seconds else None
+    }
+    print(f"✓ Solved {len(solvable)} components in {wall_seconds:.2f}s "
+          f"(sequential {component_seconds:.2f}s)", file=sys.stderr)
+
+    if baseline:
+        print(f"🧩 Baseline: solving the single model on {cores} cores...", file=sys.stderr)
+        baseline_start = time.time()
+        model = ShiftSchedulingModel(data)
+        model.solver_parameters = dict(model.solver_parameters, num_search_workers=cores)
+        model.add_hard_constraints()
+        model.create_auxiliary_variables()
+        baseline_success, baseline_result = model.solve_with_priorities(time_limit)
+        baseline_seconds = time.time() - baseline_start
+        baseline_objective = None
+        if baseline_success:
+            # Scored by the evaluator like the merged schedule, so the two are comparable
+            baseline_objective = ScheduleEvaluator(data).evaluate(baseline_result['assignments'])['stats']['objective_value']
+        stats['decomposition']['monolithic'] = {
+            'status': baseline_result['stats']['status'] if baseline_success else baseline_result['error'],
+            'seconds': baseline_seconds,
+            'objective_value': baseline_objective
+        }
+        stats['decomposition']['speedup'] = baseline_seconds / wall_seconds if wall_seconds else None
+        print(f"✓ Baseline took {baseline_seconds:.2f}s "
+              f"(speedup {stats['decomposition']['speedup']:.2f}x)", file=sys.stderr)
+    return True, {'assignments': assignments, 'stats': stats}
+
+
 def main():
     """Main entry point - reads JSON from stdin, solves, outputs JSON to stdout"""
     try:
@@ -769,15 +1810,77 @@ def main():
         for field in required_fields:
             if field not in input_data:
                 raise ValueError(f"Missing required field: {field}")
+        from datetime import datetime
+        try:
+            week_start = datetime.strptime(input_data['weekStart'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid weekStart (expected YYYY-MM-DD): {input_data['weekStart']!r}")
+
+        # Optionally record valid inputs as a corpus for tune_parameters.py. The
+        # file name comes from the parsed date, never from the raw field
+        record_dir = os.environ.get('SHIFT_SOLVER_RECORD_DIR')
+        if record_dir and input_data.get('mode', 'solve') in ['solve', 'lns', 'race', 'decompose']:
+            os.makedirs(record_dir, exist_ok=True)
+            record_path = os.path.join(record_dir, f"{week_start:%Y-%m-%d}_{int(time.time() * 1000)}.json")
+            with open(record_path, 'w') as f:
+                json.dump(input_data, f)
+            print(f"📼 Recorded input to {record_path}", file=sys.stderr)
 
         print(f"✓ Received input: {len(input_data['employees'])} employees, week {input_data['weekStart']}", file=sys.stderr)
 
-        # Build and solve model
-        model = ShiftSchedulingModel(input_data)
-        model.add_hard_constraints()
-        model.create_auxiliary_variables()
-
-        success, result = model.solve_with_priorities()
+        mode = input_data.get('mode', 'solve')
+        if mode == 'evaluate':
+            # Score a given schedule (e.g. after a manual edit) without solving
+            if 'assignments' not in input_data:
+                raise ValueError("Missing required field for evaluate mode: assignments")
+            evaluator = ScheduleEvaluator(input_data)
+            success, result = True, evaluator.evaluate(input_data['assignments'])
+        elif mode == 'suggestReplacement':
+            # Rank who can take over a single shift (e.g. after a sick call)
+            for field in ['assignments', 'day', 'shift']:
+                if field not in input_data:
+                    raise ValueError(f"Missing required field for suggestReplacement mode: {field}")
+            evaluator = ScheduleEvaluator(input_data)
+            success, result = True, evaluator.suggest_replacement(
+                input_data['assignments'],
+                int(input_data['day']),
+                input_data['shift'],
+                allow_swaps=input_data.get('allowSwaps', False)
+            )
+        elif mode == 'solve':
+            # Build and solve model
+            model = ShiftSchedulingModel(input_data)
+            model.add_hard_constraints()
+            model.create_auxiliary_variables()
+
+            success, result = model.solve_with_priorities(input_data.get('timeLimitSeconds', 60.0))
+        elif mode == 'lns':
+            # Large Neighborhood Search - for rosters too big to solve in one shot
+            model = ShiftSchedulingModel(input_data)
+            model.add_hard_constraints()
+            model.create_auxiliary_variables()
+
+            success, result = model.solve_with_lns(
+                input_data.get('timeLimitSeconds', 60.0),
+                sub_time_limit=input_data.get('lnsSubTimeLimitSeconds', 2.0)
+            )
+        elif mode == 'decompose':
+            # Independent sub-problems solved in parallel, then merged
+            success, result = solve_decomposed(
+                input_data,
+                input_data.get('timeLimitSeconds', 60.0),
+                cores=input_data.get('decomposeCores'),
+                baseline=input_data.get('decomposeBaseline', False)
+            )
+        elif mode == 'race':
+            # Portfolio of strategies in separate processes - best valid schedule wins
+            success, result = solve_race(
+                input_data,
+                input_data.get('timeLimitSeconds', 60.0),
+                cores=input_data.get('raceCores')
+            )
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
 
         # Output result
         output = {
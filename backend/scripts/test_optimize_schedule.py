@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Tests for optimize_schedule.py
+
+Run from backend/scripts:
+    python -m pytest -q test_optimize_schedule.py
+"""
+
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import optimize_schedule
+import tune_parameters
+from optimize_schedule import (RACE_STRATEGIES, ScheduleEvaluator, ScheduleInstance, ShiftSchedulingModel,
+                               solve_decomposed, solve_race)
+
+
+def random_instance(seed: int, with_history: bool = False) -> dict:
+    """Random week: 3-6 employees, sparse availability, maybe a holiday and frozen shifts"""
+    rng = random.Random(seed)
+    employees = [
+        {'id': f'emp{i}', 'name': f'Employee {i}', 'email': f'emp{i}@example.com',
+         'role': 'employee', 'isActive': True}
+        for i in range(rng.randint(3, 6))
+    ]
+    availabilities = [
+        {
+            'employeeId': emp['id'],
+            'weekStart': '2025-11-02',
+            'shifts': {
+                str(day): {
+                    shift: {'status': 'available' if rng.random() < 0.75 else 'unavailable'}
+                    for shift in ['morning', 'evening', 'night']
+                }
+                for day in range(6)
+            }
+        }
+        for emp in employees
+    ]
+    holidays = []
+    if rng.random() < 0.3:
+        holidays.append({'id': 'h1', 'date': f'2025-11-0{rng.randint(2, 7)}', 'name': 'Holiday',
+                         'type': rng.choice(['no-work', 'morning-only'])})
+    frozen = {}
+    if rng.random() < 0.3:
+        frozen[str(rng.randint(0, 4))] = {'morning': rng.choice([None, employees[0]['id']])}
+
+    data = {
+        'employees': employees,
+        'availabilities': availabilities,
+        'vacations': [],
+        'holidays': holidays,
+        'weekStart': '2025-11-02',
+        'frozenAssignments': frozen
+    }
+    if with_history:
+        # Summaries for all but the last employee, with shifts on the 2 days before the week
+        data['historySummaries'] = [
+            {
+                'employeeId': emp['id'],
+                'weeks': rng.choice([2, 4]),
+                'shiftCounts': {shift: rng.randint(0, 6) for shift in ['morning', 'evening', 'night']},
+                'lastShifts': [
+                    {'date': date, 'shift': rng.choice(['morning', 'evening', 'night'])}
+                    for date in ['2025-10-31', '2025-11-01'] if rng.random() < 0.5
+                ]
+            }
+            for emp in employees[:-1]
+        ]
+    return data
+
+
+def team_instance(team_size: int = 3) -> dict:
+    """Two teams that share nothing: one only works mornings, the other evenings and nights"""
+    data = random_instance(0)
+    data['employees'] = [
+        {'id': f'{team}{i}', 'name': f'{team}{i}', 'email': f'{team}{i}@example.com', 'role': 'employee', 'isActive': True}
+        for team in ['day', 'late'] for i in range(team_size)
+    ]
+    data['availabilities'] = [
+        {
+            'employeeId': emp['id'],
+            'weekStart': '2025-11-02',
+            'shifts': {
+                str(day): {
+                    shift: {'status': 'available' if (shift == 'morning') == emp['id'].startswith('day') else 'unavailable'}
+                    for shift in ['morning', 'evening', 'night']
+                }
+                for day in range(6)
+            }
+        }
+        for emp in data['employees']
+    ]
+    data['holidays'] = []
+    data['frozenAssignments'] = {}
+    return data
+
+
+def solve(data: dict) -> tuple:
+    model = ShiftSchedulingModel(data)
+    model.add_hard_constraints()
+    model.create_auxiliary_variables()
+    success, result = model.solve_with_priorities()
+    return model, success, result
+
+
+class EvaluatorMatchesSolverTest(unittest.TestCase):
+    """The evaluator must reproduce the solver's objective for the solver's own schedule"""
+
+    def test_objective_matches_solver(self):
+        self.check_objective_matches_solver(with_history=False)
+
+    def test_objective_matches_solver_with_history(self):
+        self.check_objective_matches_solver(with_history=True)
+
+    def check_objective_matches_solver(self, with_history: bool):
+        checked = 0
+        for seed in range(25):
+            data = random_instance(seed, with_history)
+            model, success, result = solve(data)
+            if not success:
+                continue  # Random instance happened to be infeasible
+            checked += 1
+
+            evaluation = ScheduleEvaluator(data).evaluate(
+                result['assignments'],
+                weight_min3=model.weight_min3,
+                tie_breaker_weights=model.tie_breaker_weights
+            )
+            self.assertTrue(evaluation['feasible'], f'seed {seed}: {evaluation["hard_violations"]}')
+            for key, value in result['stats'].items():
+                if key not in ['solve_time_seconds', 'best_objective_bound', 'status']:
+                    self.assertEqual(evaluation['stats'][key], value, f'seed {seed}: {key}')
+        self.assertGreater(checked, 10)
+
+
+class LnsTest(unittest.TestCase):
+
+    def test_lns_schedule_is_valid_and_scored_consistently(self):
+        data = random_instance(3)
+        for i in range(12):
+            data['employees'].append({'id': f'extra{i}', 'name': f'Extra {i}', 'email': f'extra{i}@example.com',
+                                      'role': 'employee', 'isActive': True})
+        model = ShiftSchedulingModel(data)
+        model.add_hard_constraints()
+        model.create_auxiliary_variables()
+        success, result = model.solve_with_lns(time_limit=3.0, sub_time_limit=0.5, initial_time_limit=0.5)
+        self.assertTrue(success)
+
+        stats = result['stats']
+        self.assertIn('lns_iterations', stats)
+        objectives = [step['objective'] for step in stats['lns_improvements']]
+        self.assertEqual(objectives, sorted(objectives, reverse=True))
+        self.assertEqual(objectives[-1], stats['objective_value'])
+
+        evaluation = ScheduleEvaluator(data).evaluate(
+            result['assignments'], weight_min3=model.weight_min3, tie_breaker_weights=model.tie_breaker_weights)
+        self.assertTrue(evaluation['feasible'], evaluation['hard_violations'])
+        self.assertEqual(evaluation['stats']['objective_value'], stats['objective_value'])
+        # The bound comes from the full model, never from a restricted sub-model
+        self.assertLessEqual(stats['best_objective_bound'], stats['objective_value'])
+
+    def test_initial_solve_keeps_searching_until_first_schedule(self):
+        model = ShiftSchedulingModel(random_instance(4))
+        model.add_hard_constraints()
+        model.create_auxiliary_variables()
+        success, result = model.solve_with_lns(time_limit=3.0, sub_time_limit=0.5, initial_time_limit=0.0)
+        self.assertTrue(success)
+        self.assertEqual(result['stats']['lns_improvements'][0]['neighbourhood'], 'initial')
+
+
+class RaceTest(unittest.TestCase):
+
+    def test_constructive_schedule_is_valid(self):
+        for seed in range(10):
+            data = random_instance(seed)
+            evaluator = ScheduleEvaluator(data)
+            evaluation = evaluator.evaluate(evaluator.construct_greedy())
+            # Greedy may leave a shift empty rather than break a rest rule - never anything else
+            rules = {v['rule'] for v in evaluation['hard_violations']}
+            self.assertLessEqual(rules, {'unfilled'}, f'seed {seed}')
+
+    def test_race_returns_best_validated_schedule(self):
+        data = random_instance(1)
+        success, result = solve_race(data, time_limit=3.0, cores=3)
+        self.assertTrue(success)
+
+        stats = result['stats']
+        self.assertIn(stats['strategy'], RACE_STRATEGIES)
+        self.assertEqual(set(stats['race']), set(RACE_STRATEGIES))
+        finished = [entry for entry in stats['race'].values() if entry.get('feasible')]
+        self.assertEqual(stats['objective_value'], min(entry['objective_value'] for entry in finished))
+        self.assertTrue(ScheduleEvaluator(data).evaluate(result['assignments'])['feasible'])
+
+    def test_single_core_runs_heuristic_first_and_skips_light_model(self):
+        success, result = solve_race(random_instance(1), time_limit=3.0, cores=1)
+        self.assertTrue(success)
+        race = result['stats']['race']
+        self.assertEqual(race['light']['status'], 'SKIPPED')
+        self.assertEqual(race['constructive']['status'], 'HEURISTIC')
+        self.assertIn(race['weighted']['status'], ['OPTIMAL', 'FEASIBLE'])
+
+
+class DecompositionTest(unittest.TestCase):
+
+    def test_finds_independent_teams(self):
+        data = team_instance()
+        components = ScheduleInstance(data).interaction_components()
+        teams = sorted((sorted(employees), len(cells)) for employees, cells in components)
+        self.assertEqual(teams, [(['day0', 'day1', 'day2'], 6), (['late0', 'late1', 'late2'], 10)])
+
+    def test_frozen_empty_shift_is_isolated(self):
+        data = team_instance()
+        data['frozenAssignments'] = {'2': {'morning': None}}
+        components = ScheduleInstance(data).interaction_components()
+        self.assertIn(([], [(2, 'morning')]), components)
+
+    def test_decomposed_schedule_is_valid_and_merged(self):
+        data = team_instance()
+        success, result = solve_decomposed(data, time_limit=5.0, cores=2)
+        self.assertTrue(success)
+
+        decomposition = result['stats']['decomposition']
+        self.assertTrue(decomposition['decomposed'])
+        self.assertEqual(len(decomposition['components']), 2)
+        evaluation = ScheduleEvaluator(data).evaluate(result['assignments'])
+        self.assertTrue(evaluation['feasible'])
+        self.assertEqual(evaluation['stats']['unfilled_shifts'], 0)
+        self.assertEqual(evaluation['stats']['objective_value'], result['stats']['objective_value'])
+
+    def test_baseline_reports_speedup_over_single_model(self):
+        data = team_instance()
+        success, result = solve_decomposed(data, time_limit=5.0, cores=2, baseline=True)
+        self.assertTrue(success)
+
+        decomposition = result['stats']['decomposition']
+        self.assertEqual(decomposition['monolithic']['status'], 'OPTIMAL')
+        self.assertAlmostEqual(decomposition['speedup'],
+                               decomposition['monolithic']['seconds'] / result['stats']['solve_time_seconds'])
+
+    def test_single_component_falls_back_to_normal_solve(self):
+        success, result = solve_decomposed(random_instance(1), time_limit=5.0, cores=2)
+        self.assertTrue(success)
+        self.assertFalse(result['stats']['decomposition']['decomposed'])
+
+
+class ParameterProfileTest(unittest.TestCase):
+
+    def test_profile_overrides_solver_parameters(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with open(os.path.join(profile_dir, 'tuned.json'), 'w') as f:
+                json.dump({'name': 'tuned', 'parameters': {
+                    'search_branching': 'AUTOMATIC_SEARCH', 'linearization_level': 2,
+                    'cp_model_presolve': True, 'max_time_in_seconds': 999
+                }}, f)
+            with mock.patch.object(optimize_schedule, 'PROFILE_DIR', profile_dir):
+                data = dict(random_instance(0), parameterProfile='tuned')
+                solver = ShiftSchedulingModel(data)._create_solver(time_limit=5.0)
+
+        self.assertEqual(solver.parameters.linearization_level, 2)
+        self.assertEqual(solver.parameters.symmetry_level, 2)  # Untouched defaults stay
+        self.assertEqual(solver.parameters.max_time_in_seconds, 5.0)  # Caller's time limit wins
+
+    def test_unknown_profile_is_an_error(self):
+        with self.assertRaises(ValueError):
+            ShiftSchedulingModel(dict(random_instance(0), parameterProfile='does-not-exist'))
+
+
+class TuneParametersTest(unittest.TestCase):
+
+    def test_summary_counts_missed_targets_as_twice_the_time_limit(self):
+        runs = [
+            {'time_to_target': 1.0, 'first_feasible_seconds': 0.5, 'final_gap': 0.0},
+            {'time_to_target': None, 'first_feasible_seconds': 1.5, 'final_gap': 0.2},
+        ]
+        summary = tune_parameters.summarize(runs, time_limit=10.0)
+        self.assertEqual(summary['reached_target'], 1)
+        self.assertEqual(summary['mean_time_to_target_seconds'], 1.0)
+        self.assertEqual(summary['par2_time_to_target_seconds'], 10.5)
+        self.assertEqual(summary['mean_first_feasible_seconds'], 1.0)
+
+    def test_run_once_times_the_solve_only(self):
+        run = tune_parameters.run_once(random_instance(1), {}, seed=1, time_limit=2.0)
+        self.assertTrue(run['success'])
+        self.assertLessEqual(run['first_feasible_seconds'], run['solve_seconds'])
+        self.assertEqual(run['timeline'][-1][1], run['final_objective'])
+        self.assertEqual(tune_parameters.time_to_target(run, run['final_objective']), run['timeline'][-1][0])
+
+    def test_writes_winning_profile_for_corpus(self):
+        candidates = {'current': {}, 'linearization_2': {'linearization_level': 2}}
+        with tempfile.TemporaryDirectory() as corpus, tempfile.TemporaryDirectory() as profile_dir:
+            for seed in [1, 2]:
+                with open(os.path.join(corpus, f'week{seed}.json'), 'w') as f:
+                    json.dump(random_instance(seed), f)
+            candidates_path = os.path.join(profile_dir, 'candidates.json')  # Outside the corpus
+            with open(candidates_path, 'w') as f:
+                json.dump(candidates, f)
+            argv = ['tune_parameters.py', corpus, '--name', 'weekly', '--time-limit', '1',
+                    '--seeds', '1', '--candidates', candidates_path]
+            with mock.patch.object(tune_parameters, 'PROFILE_DIR', profile_dir), \
+                    mock.patch('sys.argv', argv), mock.patch('sys.stdout'):
+                tune_parameters.main()
+            with open(os.path.join(profile_dir, 'weekly.json')) as f:
+                profile = json.load(f)
+
+        self.assertIn(profile['candidate'], candidates)
+        self.assertEqual(profile['parameters'], candidates[profile['candidate']])
+        self.assertEqual(profile['measured']['instances'], 2)
+        summaries = profile['measured']['summaries']
+        best = summaries[profile['candidate']]
+        for summary in summaries.values():
+            self.assertEqual(summary['runs'], 2)
+            self.assertGreaterEqual(best['reached_target'], summary['reached_target'])
+
+
+class EvaluatorHardRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = random_instance(0)
+        for avail in self.data['availabilities']:
+            for day_shifts in avail['shifts'].values():
+                for status in day_shifts.values():
+                    status['status'] = 'available'
+        self.data['holidays'] = []
+        self.data['frozenAssignments'] = {}
+
+    def rules(self, assignments: dict) -> set:
+        evaluation = ScheduleEvaluator(self.data).evaluate(assignments)
+        return {v['rule'] for v in evaluation['hard_violations']}
+
+    def test_detects_rest_rule_violations(self):
+        rules = self.rules({
+            '0': {'morning': 'emp0', 'night': 'emp1'},
+            '1': {'morning': 'emp1', 'evening': 'emp0', 'night': 'emp0'},
+            '2': {'morning': 'emp0'},
+            '5': {'evening': 'emp2'}
+        })
+        self.assertIn('morning_after_night', rules)
+        self.assertIn('double_shift', rules)
+        self.assertIn('unfilled', rules)
+        self.assertIn('invalid_shift', rules)
+
+    def test_detects_rest_rules_across_week_boundary(self):
+        self.data['historySummaries'] = [
+            {'employeeId': 'emp0', 'weeks': 1, 'lastShifts': [{'date': '2025-11-01', 'shift': 'night'}]},
+            {'employeeId': 'emp1', 'weeks': 1, 'lastShifts': [{'date': '2025-10-31', 'shift': 'night'},
+                                                               {'date': '2025-11-01', 'shift': 'evening'}]}
+        ]
+        evaluation = ScheduleEvaluator(self.data).evaluate({'0': {'morning': 'emp0'}, '1': {'morning': 'emp1'}})
+        self.assertIn({'rule': 'morning_after_night', 'employeeId': 'emp0', 'day': 0, 'shift': 'morning'},
+                      evaluation['hard_violations'])
+        evaluation = ScheduleEvaluator(self.data).evaluate({'0': {'morning': 'emp1'}})
+        self.assertIn('eight_eight_eight', {v['rule'] for v in evaluation['hard_violations']})
+
+    def test_history_shifts_fairness_to_short_employees(self):
+        self.data['historySummaries'] = [
+            {'employeeId': 'emp0', 'weeks': 4, 'shiftCounts': {'morning': 2, 'evening': 2, 'night': 2}},
+            {'employeeId': 'emp1', 'weeks': 2, 'shiftCounts': {'morning': 3, 'evening': 3, 'night': 3}}
+        ]
+        evaluator = ScheduleEvaluator(self.data)
+        # emp1 is scaled to 4 weeks; employees without history count as the average
+        self.assertEqual(evaluator.history_counts['emp0'], {'morning': 2, 'evening': 2, 'night': 2})
+        self.assertEqual(evaluator.history_counts['emp1'], {'morning': 6, 'evening': 6, 'night': 6})
+        self.assertEqual(evaluator.history_counts['emp2'], {'morning': 4, 'evening': 4, 'night': 4})
+        self.assertEqual(evaluator.evaluate({})['stats']['fairness_gap'], 12)
+
+    def test_history_requires_weeks(self):
+        self.data['historySummaries'] = [{'employeeId': 'emp0', 'shiftCounts': {'morning': 2}}]
+        with self.assertRaises(ValueError):
+            ScheduleEvaluator(self.data)
+
+    def test_detects_frozen_mismatch(self):
+        self.data['frozenAssignments'] = {'0': {'morning': 'emp1', 'evening': None}}
+        rules = self.rules({'0': {'morning': 'emp0', 'evening': 'emp2'}})
+        self.assertIn('frozen', rules)
+        self.assertIn('frozen_empty', rules)
+
+
+class SuggestReplacementTest(unittest.TestCase):
+    """Incremental replacement scores must agree with a full evaluation of the edited grid"""
+
+    def test_ranking_matches_full_evaluation(self):
+        for seed in range(5):
+            data = random_instance(seed)
+            _, success, result = solve(data)
+            if not success:
+                continue
+            assignments = {str(day): dict(shifts) for day, shifts in result['assignments'].items()}
+            evaluator = ScheduleEvaluator(data)
+            day, shift = evaluator.valid_shifts[len(evaluator.valid_shifts) // 2]
+
+            suggestion = evaluator.suggest_replacement(assignments, day, shift, allow_swaps=True)
+            deltas = [entry['delta'] for entry in suggestion['replacements'] if entry['feasible']]
+            self.assertEqual(deltas, sorted(deltas))
+
+            for entry in suggestion['replacements'] + suggestion['swaps']:
+                edited = {day: dict(shifts) for day, shifts in assignments.items()}
+                edited[str(day)][shift] = entry['employeeId']
+                if 'swap' in entry:
+                    edited[str(entry['swap']['day'])][entry['swap']['shift']] = entry['swap']['coveredBy']
+                evaluation = evaluator.evaluate(edited)
+                self.assertEqual(evaluation['stats']['objective_value'], entry['objective_value'])
+                if entry['feasible']:
+                    self.assertTrue(evaluation['feasible'], f'seed {seed}: {evaluation["hard_violations"]}')
+
+    def test_frozen_cell_only_accepts_frozen_employee(self):
+        data = team_instance()
+        data['frozenAssignments'] = {'0': {'morning': None}, '1': {'morning': 'day1'}}
+        evaluator = ScheduleEvaluator(data)
+        assignments = {'1': {'morning': 'day1'}}
+
+        # Frozen empty: the shift must stay empty, so nobody is a feasible replacement
+        suggestion = evaluator.suggest_replacement(assignments, 0, 'morning', allow_swaps=True)
+        self.assertTrue(suggestion['replacements'])
+        self.assertFalse(any(entry['feasible'] for entry in suggestion['replacements'] + suggestion['swaps']))
+
+        # Frozen to day1: every other candidate breaks the frozen assignment
+        suggestion = evaluator.suggest_replacement(assignments, 1, 'morning')
+        for entry in suggestion['replacements']:
+            self.assertFalse(entry['feasible'])
+            edited = {'1': {'morning': entry['employeeId']}}
+            self.assertIn('frozen', {v['rule'] for v in evaluator.evaluate(edited)['hard_violations']})
+
+
+if __name__ == '__main__':
+    unittest.main()
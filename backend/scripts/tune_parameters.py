@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+CP-SAT parameter tuning over a corpus of recorded inputs
+
+Replays every input JSON in a directory under candidate parameter sets and
+seeds, and measures per run:
+  - time to first feasible schedule
+  - time to target objective (best final objective any candidate reached
+    on that instance with the same seed)
+  - final relative gap between objective and best bound
+
+The winner (most runs reaching the target, then lowest PAR-2 time to target)
+is written as a named profile to solver_profiles/<name>.json. The solver loads
+it when the input contains "parameterProfile": "<name>".
+
+Record a corpus from the running backend with SHIFT_SOLVER_RECORD_DIR=<dir>.
+
+Usage:
+    python tune_parameters.py CORPUS_DIR --name weekly [--time-limit 20] [--seeds 3]
+                              [--candidates candidates.json]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from ortools.sat.python import cp_model
+
+from optimize_schedule import PROFILE_DIR, ShiftSchedulingModel
+
+# Candidate parameter sets. 'current' is what _create_solver() uses today.
+CANDIDATES = {
+    'current': {},
+    'cp_sat_defaults': {
+        'linearization_level': 1,
+        'search_branching': 'AUTOMATIC_SEARCH',
+        'symmetry_level': 2,
+        'cp_model_probing_level': 2,
+    },
+    'linearization_1': {'linearization_level': 1},
+    'linearization_2': {'linearization_level': 2},
+    'automatic_search': {'search_branching': 'AUTOMATIC_SEARCH'},
+    'symmetry_1': {'symmetry_level': 1},
+    'probing_1': {'cp_model_probing_level': 1},
+    'workers_4': {'num_search_workers': 4},
+}
+
+
+class RunTimeline(cp_model.CpSolverSolutionCallback):
+    """Records (seconds, objective) for every improving solution"""
+
+    def __init__(self):
+        super().__init__()
+        self.start = time.time()
+        self.points = []
+
+    def on_solution_callback(self):
+        self.points.append((time.time() - self.start, self.ObjectiveValue()))
+
+
+def run_once(data: dict, parameters: dict, seed: int, time_limit: float) -> dict:
+    """Solve one instance with one parameter set; the seed fixes the solver and the random objective weights"""
+    random.seed(seed)  # Same tie-breaker weights for every candidate with this seed
+    with contextlib.redirect_stderr(io.StringIO()):
+        model = ShiftSchedulingModel(data)
+        model.add_hard_constraints()
+        model.create_auxiliary_variables()
+        model.solver_parameters = dict(parameters, random_seed=seed)
+        model.build_objective()
+        timeline = RunTimeline()  # Start the clock after building: solver time only
+        success, result = model.solve_with_priorities(time_limit, solution_callback=timeline)
+
+    stats = result.get('stats', {})
+    objective = stats.get('objective_value')
+    bound = stats.get('best_objective_bound')
+    gap = None
+    if success and objective:
+        gap = abs(objective - bound) / abs(objective)
+    elif success:
+        gap = 0.0
+    return {
+        'success': success,
+        'first_feasible_seconds': timeline.points[0][0] if timeline.points else None,
+        'final_objective': objective,
+        'final_gap': gap,
+        'solve_seconds': stats.get('solve_time_seconds', time_limit),
+        'timeline': timeline.points,
+    }
+
+
+def time_to_target(run: dict, target: Optional[float]) -> Optional[float]:
+    if target is None:
+        return None
+    for seconds, objective in run['timeline']:
+        if objective <= target:
+            return seconds
+    return None
+
+
+def summarize(runs: List[dict], time_limit: float) -> dict:
+    reached = [run['time_to_target'] for run in runs if run['time_to_target'] is not None]
+    firsts = [run['first_feasible_seconds'] for run in runs if run['first_feasible_seconds'] is not None]
+    gaps = [run['final_gap'] for run in runs if run['final_gap'] is not None]
+    # PAR-2: runs that never reach the target count as twice the time limit
+    par2 = [run['time_to_target'] if run['time_to_target'] is not None else 2 * time_limit for run in runs]
+    return {
+        'runs': len(runs),
+        'reached_target': len(reached),
+        'mean_first_feasible_seconds': statistics.mean(firsts) if firsts else None,
+        'mean_time_to_target_seconds': statistics.mean(reached) if reached else None,
+        'par2_time_to_target_seconds': statistics.mean(par2) if par2 else None,
+        'mean_final_gap': statistics.mean(gaps) if gaps else None,
+    }
+
+
+def fmt(value, digits: int = 3) -> str:
+    return '-' if value is None else f"{value:.{digits}f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', help='Directory of recorded input JSON files')
+    parser.add_argument('--name', required=True, help='Profile name to write (solver_profiles/<name>.json)')
+    parser.add_argument('--time-limit', type=float, default=20.0, help='Seconds per run')
+    parser.add_argument('--seeds', type=int, default=3, help='Seeds per instance and candidate')
+    parser.add_argument('--candidates', help='JSON file of {name: {parameter: value}} to try instead of the built-in sets')
+    args = parser.parse_args()
+
+    candidates: Dict[str, dict] = CANDIDATES
+    if args.candidates:
+        with open(args.candidates) as f:
+            candidates = json.load(f)
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, '*.json')))
+    if not paths:
+        raise SystemExit(f"No input JSON files in {args.corpus}")
+
+    runs: Dict[str, List[dict]] = {name: [] for name in candidates}
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for seed in range(1, args.seeds + 1):
+            results = {name: run_once(data, parameters, seed, args.time_limit) for name, parameters in candidates.items()}
+            finals = [r['final_objective'] for r in results.values() if r['final_objective'] is not None]
+            target = min(finals) if finals else None
+            for name, result in results.items():
+                result['time_to_target'] = time_to_target(result, target)
+                runs[name].append(result)
+            print(f"{os.path.basename(path)} seed {seed}: target {target}, " +
+                  ', '.join(f"{name} {fmt(r['time_to_target'], 2)}s" for name, r in results.items()))
+
+    summaries = {name: summarize(name_runs, args.time_limit) for name, name_runs in runs.items()}
+
+    print(f"\n{'candidate':<20} {'reached':>8} {'first (s)':>10} {'target (s)':>11} {'PAR-2 (s)':>10} {'gap':>8}")
+    for name, summary in summaries.items():
+        print(f"{name:<20} {summary['reached_target']:>4}/{summary['runs']:<3} "
+              f"{fmt(summary['mean_first_feasible_seconds']):>10} {fmt(summary['mean_time_to_target_seconds']):>11} "
+              f"{fmt(summary['par2_time_to_target_seconds']):>10} {fmt(summary['mean_final_gap'], 4):>8}")
+
+    best = min(summaries, key=lambda name: (-summaries[name]['reached_target'], summaries[name]['par2_time_to_target_seconds']))
+    profile = {
+        'name': args.name,
+        'candidate': best,
+        'parameters': candidates[best],
+        'measured': {
+            'instances': len(paths),
+            'seeds': args.seeds,
+            'time_limit_seconds': args.time_limit,
+            'summaries': summaries,
+        },
+    }
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_path = os.path.join(PROFILE_DIR, f"{os.path.basename(args.name)}.json")
+    with open(profile_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f"\nBest: {best} {candidates[best]} -> {profile_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -40,6 +40,23 @@ interface ORToolsInput {
       [shiftId: string]: string | null; // employeeId or null for "frozen empty"
     };
   };
+  // Named CP-SAT parameter profile (scripts/solver_profiles/<name>.json)
+  parameterProfile?: string;
+  // Rolling-horizon fairness - compact summary of previous weeks per employee
+  historySummaries?: Array<{
+    employeeId: string;
+    weeks: number;
+    shiftCounts: {
+      morning: number;
+      evening: number;
+      night: number;
+    };
+    // Shifts worked on the 2 days before weekStart (for rest rules across weeks)
+    lastShifts?: Array<{
+      date: string;
+      shift: 'morning' | 'evening' | 'night';
+    }>;
+  }>;
 }
 
 interface ORToolsOutput {